@@ -1,17 +1,52 @@
-﻿from sqlalchemy import create_engine
+﻿import io
+from functools import lru_cache
+
+from psycopg2 import sql
+from sqlalchemy import create_engine
 import pandas as pd
 
+
+@lru_cache(maxsize=4)
+def get_engine(dsn):
+    # One pooled engine per database, reused across insert_postgres calls
+    return create_engine(dsn, pool_size=4, pool_pre_ping=True)
+
+
+def copy_dataframe(df, table_name, engine, chunksize=100_000):
+    # Create the table if it is missing, then stream the rows through COPY FROM STDIN.
+    # DataFrame.to_csv encodes whole column blocks in C instead of formatting
+    # one Python tuple per row
+    df.head(0).to_sql(table_name, engine, if_exists='append', index=False)
+
+    # Table and column names are quoted as identifiers, matching the names
+    # to_sql created (mixed case, reserved words)
+    copy_statement = sql.SQL('COPY {} ({}) FROM STDIN WITH CSV').format(
+        sql.Identifier(table_name),
+        sql.SQL(', ').join(map(sql.Identifier, df.columns))
+    )
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cur:
+            for start in range(0, len(df), chunksize):
+                buf = io.StringIO()
+                df.iloc[start:start + chunksize].to_csv(buf, index=False, header=False)
+                buf.seek(0)
+                cur.copy_expert(copy_statement, buf)
+        conn.commit()
+    finally:
+        conn.close()
+
+
 def insert_postgres(table_name, df, username, password, host, port, database):
     try:
-        # Create the connection engine
-        engine = create_engine(f'postgresql+psycopg2://{username}:{password}@{host}:{port}/{database}')
+        # Reuse the pooled connection engine for this database
+        engine = get_engine(f'postgresql+psycopg2://{username}:{password}@{host}:{port}/{database}')
         
-        # Insert the DataFrame into the PostgreSQL table
-        df.to_sql(table_name, engine, if_exists='append', index=False)
+        # Bulk load the DataFrame into the PostgreSQL table with COPY
+        copy_dataframe(df, table_name, engine)
 
         print(f"Successfully inserted {len(df)} rows into '{table_name}'.")
 
     except Exception as e:
         print(f"Failed to insert data into '{table_name}'. Error: {e}")
 
-
@@ -0,0 +1,51 @@
+from pathlib import Path
+
+import pandas as pd
+import pymrio
+
+
+EXTENSIONS = ['air_emissions', 'employment', 'energy', 'factor_inputs', 'land', 'material', 'nutrients', 'water']
+
+
+class CachedExtension:
+    def __init__(self, F):
+        self.F = F
+
+
+class CachedExiobase:
+    # Stand-in for the parts of a pymrio IOSystem the pipelines use:
+    # Z, Y, get_regions() and each extension's F matrix
+    def __init__(self, Z, Y, extensions):
+        self.Z = Z
+        self.Y = Y
+        for ext_name, F in extensions.items():
+            setattr(self, ext_name, CachedExtension(F))
+
+    def get_regions(self):
+        return self.Z.index.get_level_values(0).unique()
+
+
+def load_exio(exio_path, year, cache_folder=Path(__file__).parent.parent / 'cache'):
+    # Parsing the Exiobase archive is slow, so the matrices the pipelines need are
+    # kept as Parquet files and re-read from there on later runs
+    cache_path = Path(cache_folder) / f'exio_{year}'
+    matrix_names = ['Z', 'Y'] + EXTENSIONS
+
+    if all((cache_path / f'{name}.parquet').exists() for name in matrix_names):
+        matrices = {name: pd.read_parquet(cache_path / f'{name}.parquet') for name in matrix_names}
+    else:
+        exio_model = pymrio.parse_exiobase3(exio_path)
+
+        matrices = {'Z': exio_model.Z, 'Y': exio_model.Y}
+        for ext_name in EXTENSIONS:
+            matrices[ext_name] = getattr(exio_model, ext_name).F
+
+        cache_path.mkdir(parents=True, exist_ok=True)
+        for name, df in matrices.items():
+            df.to_parquet(cache_path / f'{name}.parquet', engine='pyarrow', compression='zstd')
+
+    return CachedExiobase(
+        matrices['Z'],
+        matrices['Y'],
+        {ext_name: matrices[ext_name] for ext_name in EXTENSIONS}
+    )
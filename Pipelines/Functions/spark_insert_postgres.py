@@ -1,6 +1,6 @@
 from pyspark.sql import DataFrame
 
-def insert_postgres_spark(df: DataFrame, table_name: str, username: str, password: str, host: str, port: int, database: str):
+def insert_postgres_spark(df: DataFrame, table_name: str, username: str, password: str, host: str, port: int, database: str, expected_rows: int = None):
     try:
         # JDBC URL format for PostgreSQL
         jdbc_url = f"jdbc:postgresql://{host}:{port}/{database}"
@@ -9,13 +9,21 @@ def insert_postgres_spark(df: DataFrame, table_name: str, username: str, passwor
         connection_properties = {
             "user": username,
             "password": password,
-            "driver": "org.postgresql.Driver"
+            "driver": "org.postgresql.Driver",
+            # Send inserts in batches of 10k and let the driver rewrite them into multi-row INSERTs
+            "batchsize": "10000",
+            "reWriteBatchedInserts": "true"
         }
 
         # Write DataFrame to PostgreSQL table
         df.write.jdbc(url=jdbc_url, table=table_name, mode="append", properties=connection_properties)
         
-        print(f"Successfully inserted {df.count()} rows into '{table_name}'.")
+        # df.count() here would re-run the whole upstream plan, so only report a
+        # row count when the caller already knows it
+        if expected_rows is None:
+            print(f"Successfully inserted rows into '{table_name}'.")
+        else:
+            print(f"Successfully inserted {expected_rows} rows into '{table_name}'.")
 
     except Exception as e:
         print(f"Failed to insert data into '{table_name}'. Error: {e}")
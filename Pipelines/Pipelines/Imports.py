@@ -1,5 +1,11 @@
-import pymrio
+import sys
+from pathlib import Path
+
 import pandas as pd
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "Functions"))
+from load_exio import load_exio
 
 
 year = 2013
@@ -12,7 +18,7 @@ countries_path = r"C:\Users\garma\Downloads\exio_country_names.csv"
 
 #exio_model.calc_all()
 
-exio_model = pymrio.parse_exiobase3(exio_path)
+exio_model = load_exio(exio_path, year)
 
 
 
@@ -21,24 +27,24 @@ regions = exio_model.get_regions()
 Z = exio_model.Z
 Y = exio_model.Y
 
-# Build a list of dicts
-data_list = []
+n_regions = len(regions)
 
-for i in regions:
-    Z_i = Z.loc[(i, slice(None)), :]
-    Y_i = Y.loc[(i, slice(None)), :]
-    for j in regions:
-        Z_ij = Z_i.loc[:, (j, slice(None))].sum().sum()
-        Y_ij = Y_i.loc[:, (j, slice(None))].sum().sum()
-        total_exports_ij = Z_ij + Y_ij
-        data_list.append({
-            "region1": i,
-            "region2": j,
-            "value": total_exports_ij
-        })
+# Both matrices are ordered region-major, so viewing them as
+# (region, sector, region, column) blocks lets one reduction replace
+# the region x region loop over .loc slices
+Z_block = Z.to_numpy().reshape(n_regions, -1, n_regions, Z.shape[1] // n_regions).sum(axis=(1, 3))
+Y_block = Y.to_numpy().reshape(n_regions, -1, n_regions, Y.shape[1] // n_regions).sum(axis=(1, 3))
+total_exports = Z_block + Y_block
 
-# Convert to a DataFrame in "long" (relational) format already
-df_relational = pd.DataFrame(data_list)
+# Convert to a DataFrame in "long" (relational) format already; the region
+# columns are categoricals over the region list, so the name lookup below only
+# touches each distinct code once
+region_codes = np.arange(n_regions)
+df_relational = pd.DataFrame({
+    "region1": pd.Categorical.from_codes(np.repeat(region_codes, n_regions), regions),
+    "region2": pd.Categorical.from_codes(np.tile(region_codes, n_regions), regions),
+    "value": total_exports.ravel()
+})
 
 
 
@@ -48,22 +54,12 @@ file_path = r"C:\Users\garma\Downloads\exio_country_names.csv"
 
 df_country_names = pd.read_csv(file_path)
 
-# Rename columns for clarity
-df_country_names.rename(columns={"CountryCode": "region_short", "Country": "region_full"}, inplace=True)
-
-# Load your existing df_relational (Ensure this DataFrame is created before running the script)
-# Example:
-# df_relational = pd.DataFrame([...])  # Your existing DataFrame
-
-# Join with df_relational to replace `region1`
-df_relational = df_relational.merge(df_country_names, left_on="region1", right_on="region_short", how="left")
-df_relational.drop(columns=["region1", "region_short"], inplace=True)
-df_relational.rename(columns={"region_full": "region1"}, inplace=True)
+# Build a code -> full name lookup once
+code2name = dict(zip(df_country_names["CountryCode"], df_country_names["Country"]))
 
-# Join with df_relational to replace `region2`
-df_relational = df_relational.merge(df_country_names, left_on="region2", right_on="region_short", how="left")
-df_relational.drop(columns=["region2", "region_short"], inplace=True)
-df_relational.rename(columns={"region_full": "importing_country","region1":"exporting_country" }, inplace=True)
+# Replace the short region codes with full country names
+df_relational["exporting_country"] = df_relational.pop("region1").map(code2name)
+df_relational["importing_country"] = df_relational.pop("region2").map(code2name)
 
 # Display updated DataFrame
 print(df_relational.head())
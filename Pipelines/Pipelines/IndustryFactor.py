@@ -1,6 +1,10 @@
+import sys
+from pathlib import Path
+
 import pandas as pd
 
-import pymrio
+sys.path.append(str(Path(__file__).resolve().parent.parent / "Functions"))
+from load_exio import load_exio
 
 
 year = 2013
@@ -13,34 +17,30 @@ countries_path = r"C:\Users\garma\Downloads\exio_country_names.csv"
 
 #exio_model.calc_all()
 
-exio_model = pymrio.parse_exiobase3(exio_path)
+exio_model = load_exio(exio_path, year)
 
 extensions_to_use = ['air_emissions', 'employment', 'energy', 'factor_inputs', 'land', 'material', 'nutrients', 'water']
 
 
 df_final = pd.DataFrame()
 
+country_names = pd.read_csv(countries_path, engine='pyarrow')
+code2country = dict(zip(country_names['CountryCode'], country_names['Country']))
 
 
-for ext_name in extensions_to_use:
-    # Step 1: Load the F matrix (e.g., employment)
-
-    df = getattr(exio_model, ext_name).F.copy()
-
-    # Step 2: Preserve 'stressor' and flatten the rest of the MultiIndex columns
-    df = df.reset_index()
-    df.columns = ["stressor"] + [f"{col[0]}|{col[1]}" for col in df.columns[1:]]
-    # Step 3: Melt the DataFrame to long format
-    df_melted = df.melt(id_vars="stressor", var_name="region_sector", value_name="value")
 
-    # Step 4: Filter out any rows where 'region_sector' doesn't contain a pipe (|)
-    df_melted = df_melted[df_melted["region_sector"].str.count("\|") == 1]
+for ext_name in extensions_to_use:
+    # Step 1: Load the F matrix (e.g., employment); stack() below returns a new
+    # frame, so F is used as-is rather than copied
 
-    # Step 5: Split 'region_sector' into 'region' and 'sector'
-    df_melted[["region", "sector"]] = df_melted["region_sector"].str.split("|", expand=True)
+    df = getattr(exio_model, ext_name).F
 
-    # Step 6: Drop the combined column
-    df_melted.drop(columns="region_sector", inplace=True)
+    # Step 2: Stack the (region, sector) column MultiIndex straight into long format
+    df_melted = (
+        df.stack(level=[0, 1], future_stack=True)
+        .rename_axis(["stressor", "region", "sector"])
+        .reset_index(name="value")
+    )
 
     # Step 7: Reorder columns if needed
 
@@ -53,12 +53,9 @@ for ext_name in extensions_to_use:
     df_melted = df_melted[["region", "sector", "factor", "year", "value"]]
 
 
-    country_names = pd.read_csv(countries_path)
-
-
-    merged_df = country_names.merge(df_melted, left_on='CountryCode', right_on='region', how='inner')
-    merged_df.drop(columns=["CountryCode","region"], inplace=True)
-    merged_df.rename(columns={"Country": "country"}, inplace=True)
+    # Translate region codes to country names, dropping unknown regions
+    df_melted.insert(0, 'country', df_melted.pop('region').map(code2country))
+    merged_df = df_melted.dropna(subset=['country'])
 
     merged_df['extension'] = ext_name
     industry_factor = merged_df
@@ -1,6 +1,10 @@
+import sys
+from pathlib import Path
+
 import pandas as pd
 
-import pymrio
+sys.path.append(str(Path(__file__).resolve().parent.parent / "Functions"))
+from load_exio import load_exio
 
 
 year = 2013
@@ -13,99 +17,98 @@ countries_path = r"C:\Users\garma\Downloads\exio_country_names.csv"
 
 #exio_model.calc_all()
 
-exio_model = pymrio.parse_exiobase3(exio_path)
+exio_model = load_exio(exio_path, year)
 
 import pandas as pd
+import numpy as np
 
 
-extensions_to_use = ['air_emissions', 'employment', 'energy', 'factor_inputs', 'land', 'material', 'nutrients', 'water']
-
-
-# Step 1: Pick extension, e.g., employment
-#ext_name = "air_emissions"
-
-for ext_name in extensions_to_use:
-    ext = getattr(exio_model, ext_name).F.copy()
-
-    # Step 2: Normalize column MultiIndex to flat "region|product"
-    ext.columns = [f"{region}|{product}" for region, product in ext.columns]
-
-    # Step 3: Melt to long format
-    df_ext = ext.reset_index(names='indicator')
-    df_ext = df_ext.melt(id_vars='indicator', var_name='region_product', value_name='value')
-    df_ext[['region', 'product']] = df_ext['region_product'].str.split("|", expand=True)
-    df_ext.drop(columns='region_product', inplace=True)
+# Build the long form of Z from its nonzero entries only; Z is very sparse and
+# the extensions below all share it, so this is done once
+Z = exio_model.Z
+Z_values = Z.to_numpy()
+row_idx, col_idx = np.nonzero(Z_values)
 
+Z_stacked = pd.DataFrame({
+    'from_region': Z.index.get_level_values(0)[row_idx],
+    'from_product': Z.index.get_level_values(1)[row_idx],
+    'to_region': Z.columns.get_level_values(0)[col_idx],
+    'to_product': Z.columns.get_level_values(1)[col_idx],
+    'flow': Z_values[row_idx, col_idx]
+})
+#Z_stacked = Z_stacked.head(1000)
+########## .head(1000)
 
 
+countries = pd.read_csv(countries_path, engine='pyarrow')
+code2country = dict(zip(countries['CountryCode'], countries['Country']))
 
-    # Step 1: Copy original Z matrix
-    Z = exio_model.Z.copy()
+# Translate region codes to country names once per Z entry and drop flows that
+# touch unknown regions before they get repeated for every indicator
+from_country = Z_stacked['from_region'].map(code2country)
+to_country = Z_stacked['to_region'].map(code2country)
+known = (from_country.notna() & to_country.notna()).to_numpy()
 
-    # Step 2: Ensure names are assigned
-    Z.index.names = ['from_region', 'from_product']
-    Z.columns.names = ['to_region', 'to_product']
+row_idx = row_idx[known]
+flow = Z_stacked['flow'].to_numpy()[known]
 
-    # Step 3: Stack the column MultiIndex into rows
-    Z_stacked = Z.stack(level=['to_region', 'to_product'], future_stack=True).reset_index()
+# Labels are kept as categoricals: small integer codes plus one shared dictionary
+from_country = pd.Categorical(from_country[known])
+to_country = pd.Categorical(to_country[known])
+product = pd.Categorical(Z_stacked['from_product'][known])
 
-    # Step 4: Rename the columns
-    Z_stacked.columns = ['from_region', 'from_product', 'to_region', 'to_product', 'flow']
 
-    # Step 5: Optional - filter out 0 flows
-    Z_stacked = Z_stacked[Z_stacked['flow'] != 0]
-    #Z_stacked = Z_stacked.head(1000)
-    ########## .head(1000)
-    
-    Z_stacked = Z_stacked
-    
-    # Step 5: Merge Z with extension factors
-    
-    
-    #df = Z_stacked.merge(df_ext.head(1000), left_on=['from_region', 'from_product'], right_on=['region', 'product'], how='left')
-    ######### df_ext.head(1000) 
-    
-    df = Z_stacked.merge(df_ext, left_on=['from_region', 'from_product'], right_on=['region', 'product'], how='left')
-    df.drop(columns=['region', 'product'], inplace=True)
+extensions_to_use = ['air_emissions', 'employment', 'energy', 'factor_inputs', 'land', 'material', 'nutrients', 'water']
 
-    # Step 6: Calculate impact = flow  factor value
-    df['impact'] = df['flow'] * df['value']
 
-    # Step 7: Final formatting
-    df_final = df[['from_region', 'to_region', 'from_product', 'indicator', 'impact']].copy()
-    df_final.columns = ['FromRegion', 'ToRegion', 'Product', 'Indicator', 'Value']
-    df_final['Year'] = 2013  # Adjust to match your dataset
-    df_final['Unit'] = 'unit from extension metadata'
-    df_final['Factor'] = ext_name
+# Step 1: Pick extension, e.g., employment
+#ext_name = "air_emissions"
 
-    countries = pd.read_csv(countries_path)
+# Collect every extension's rows so they go to postgres in one bulk load
+frames_list = []
 
-    df_final = pd.merge(df_final, countries, how='inner', left_on=['FromRegion'], right_on=['CountryCode'])
-    df_final.rename(columns={'Country': 'FromCountry'}, inplace=True)
+for ext_name in extensions_to_use:
+    F = getattr(exio_model, ext_name).F
+
+    # Step 2: Look up factor values by position instead of merging on
+    # (region, product); every Z row maps to one F column
+    F_pos = F.columns.get_indexer(Z.index)[row_idx]
+    n_indicators = len(F.index)
+
+    # get_indexer gives -1 for a Z row with no F column; those rows get NaN
+    # impacts, as the left merge did, instead of reading F's last column
+    has_factor = F_pos >= 0
+
+    # Step 6: Calculate impact = flow × factor value straight on the gathered
+    # float arrays, one row per (Z entry, indicator)
+    impact = F.to_numpy(dtype=float)[:, F_pos] * flow
+    impact[:, ~has_factor] = np.nan
+    impact = impact.T.ravel()
+    indicator = pd.Categorical(F.index)
+
+    # Step 7: Final formatting, with the columns named for postgres
+    df_final = pd.DataFrame({
+        'product_category': pd.Categorical.from_codes(np.repeat(product.codes, n_indicators), product.categories),
+        'impact_category': pd.Categorical.from_codes(np.tile(indicator.codes, len(flow)), indicator.categories),
+        'impact_value': impact,
+        'year': 2013,  # Adjust to match your dataset
+        'unit': 'unit from extension metadata',
+        'factor': ext_name,
+        'from_country': pd.Categorical.from_codes(np.repeat(from_country.codes, n_indicators), from_country.categories),
+        'to_country': pd.Categorical.from_codes(np.repeat(to_country.codes, n_indicators), to_country.categories)
+    })
 
-    df_final = pd.merge(df_final, countries, how='inner', left_on=['ToRegion'], right_on=['CountryCode'])
-    df_final.rename(columns={'Country': 'ToCountry'}, inplace=True)
 
-    df_final.drop(columns=['FromRegion', 'ToRegion', 'CountryCode_x', 'CountryCode_y'], inplace=True)
+    df_final.head()
 
-    # insert postgres make columns for postgres
-    df_final.columns = [
-        'product_category',
-        'impact_category',
-        'impact_value',
-        'year',
-        'unit',
-        'factor',
-        'from_country',
-        'to_country'
-    ]
+    frames_list.append(df_final.head(100))
 
 
-    df_final.head()
+all_df = pd.concat(frames_list, ignore_index=True)
 
-    insert_postgres('producttradeimpact', df_final.head(100), user, password, host, port, database)
+insert_postgres('producttradeimpact', all_df, user, password, host, port, database)
 
-    # end of postgres insertion
+# end of postgres insertion
 
 
 
@@ -148,7 +151,7 @@ for i in range(0, len(Z_stacked), chunk_size):
 
 df = pd.concat(chunks, ignore_index=True)
 
-# Step 6: Calculate impact = flow  value
+# Step 6: Calculate impact = flow × value
 df['impact'] = df['flow'] * df['value']
 
 # Step 7: Final formatting
@@ -5,18 +5,31 @@ Configuration loader for Exiobase Trade Flow Analysis
 
 import yaml
 import os
+import copy
+from functools import lru_cache
 from pathlib import Path
 
+# Use the C-accelerated YAML loader when PyYAML is built with libyaml
+YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+@lru_cache(maxsize=1)
+def _read_config(config_path, mtime_ns):
+    """
+    Parse config.yaml; cached per file modification time
+    """
+    with open(config_path, 'r') as f:
+        return yaml.load(f, Loader=YamlLoader)
+
 def load_config():
     """
     Load configuration from config.yaml
+    The file is only re-parsed when it changes; each caller gets its own copy
     """
     config_path = Path(__file__).parent / 'config.yaml'
     
-    with open(config_path, 'r') as f:
-        config = yaml.safe_load(f)
+    config = _read_config(config_path, config_path.stat().st_mtime_ns)
     
-    return config
+    return copy.deepcopy(config)
 
 def update_config(updates):
     """
@@ -26,7 +39,7 @@ def update_config(updates):
     
     # Load current config
     with open(config_path, 'r') as f:
-        config = yaml.safe_load(f)
+        config = yaml.load(f, Loader=YamlLoader)
     
     # Update with new values
     config.update(updates)
@@ -66,6 +79,26 @@ def get_output_folder(config, tradeflow_type=None):
     # Substitute year and country placeholders
     return folder_path.format(year=config['YEAR'], country=country)
 
+# Per-trade summary files written by trade_impact.py and trade_resource.py
+SUMMARY_FILE_KEYS = ('trade_impact', 'trade_resource', 'trade_employment', 'trade_material')
+
+def get_output_filename(config, file_key):
+    """
+    Get the filename for a given file key
+    trade_factor files use a .parquet suffix when OUTPUT_FORMAT is parquet,
+    the summary files when SUMMARY_FORMAT is parquet
+    """
+    filename = config['FILES'][file_key]
+    if file_key.startswith('trade_factor'):
+        output_format = config.get('OUTPUT_FORMAT', 'csv')
+    elif file_key in SUMMARY_FILE_KEYS:
+        output_format = config.get('SUMMARY_FORMAT', 'csv')
+    else:
+        output_format = 'csv'
+    if output_format == 'parquet':
+        filename = str(Path(filename).with_suffix('.parquet'))
+    return filename
+
 def get_file_path(config, file_key, tradeflow_type=None):
     """
     Get full file path for a given file key
@@ -78,17 +111,17 @@ def get_file_path(config, file_key, tradeflow_type=None):
         current_tradeflow = tradeflow_type or config.get('TRADEFLOW', '')
         if current_tradeflow.lower() == 'domestic':
             # For domestic flows, check if _lg version exists, otherwise use regular
-            lg_path = f"{folder}/{config['FILES']['trade_factor_domestic']}"
-            regular_path = f"{folder}/{config['FILES']['trade_factor']}"
+            lg_path = f"{folder}/{get_output_filename(config, 'trade_factor_domestic')}"
+            regular_path = f"{folder}/{get_output_filename(config, 'trade_factor')}"
             
             if Path(lg_path).exists():
-                filename = config['FILES']['trade_factor_domestic']
+                filename = get_output_filename(config, 'trade_factor_domestic')
             else:
-                filename = config['FILES']['trade_factor']
+                filename = get_output_filename(config, 'trade_factor')
         else:
-            filename = config['FILES'][file_key]
+            filename = get_output_filename(config, file_key)
     else:
-        filename = config['FILES'][file_key]
+        filename = get_output_filename(config, file_key)
     
     # Ensure folder exists
     Path(folder).mkdir(parents=True, exist_ok=True)
@@ -7,27 +7,59 @@ For imports/exports: creates only trade_factor.csv
 
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from config_loader import load_config, get_file_path, get_reference_file_path, get_output_folder
+from config_loader import load_config, get_file_path, get_reference_file_path, get_output_folder, get_output_filename
+from table_io import read_csv_cached, read_reference_csv
+
+# Columns used from the input CSVs and their types; only the trade.csv
+# columns coefficient generation needs, with int32 ids to match
+# TRADE_FACTOR_SCHEMA (impact_summary.SUMMARY_TRADE_DTYPES is the full read
+# used for the summary files)
+COEFFICIENT_TRADE_DTYPES = {'trade_id': 'int32', 'industry1': 'str', 'amount': 'float64'}
+FACTOR_DTYPES = {'factor_id': 'int32', 'stressor': 'str', 'extension': 'str'}
+
+# Ids fit comfortably in int32; impact_value stays float64 because trade
+# amounts run to millions and the downstream sums are rounded to 3 decimals
+TRADE_FACTOR_SCHEMA = pa.schema([
+    ('trade_id', pa.int32()),
+    ('factor_id', pa.int32()),
+    ('coefficient', pa.float32()),
+    ('impact_value', pa.float64())
+])
+
+# Coefficient rules: (extension, factor name pattern, low, high, boosted industries, boost)
+# The first matching rule wins; None matches anything
+COEFFICIENT_RULES = [
+    ('air_emissions', 'CO2|CH4|N2O', 0.1, 2.0, ['ELECT', 'AIRTR', 'CRUDE'], 3.0),
+    ('air_emissions', None, 0.001, 0.1, [], 1.0),
+    ('employment', '(?i)people', 5, 50, [], 1.0),        # People per million EUR
+    ('employment', '(?i)hours', 1000, 10000, [], 1.0),   # Hours per million EUR
+    ('employment', None, 1, 100, [], 1.0),
+    ('energy', None, 0.1, 2.0, ['ELECT', 'CRUDE', 'BASIC'], 2.0),    # TJ per million EUR
+    ('water', None, 0.001, 0.5, ['AGRIC', 'FOOD', 'ELECT'], 3.0),    # Mm3 per million EUR
+    ('land', None, 0.001, 0.1, ['AGRIC', 'FORES'], 10.0),            # km2 per million EUR
+    ('material', None, 0.1, 10.0, ['CRUDE', 'BASIC', 'METAL'], 3.0), # kt per million EUR
+    (None, None, 0.001, 1.0, [], 1.0)
+]
+RULE_LOW = np.array([rule[2] for rule in COEFFICIENT_RULES], dtype=float)
+RULE_HIGH = np.array([rule[3] for rule in COEFFICIENT_RULES], dtype=float)
+RULE_BOOST = np.array([rule[5] for rule in COEFFICIENT_RULES], dtype=float)
 
 def create_run_note(config, stage, details):
     """Create or update run progress note"""
     folder = get_output_folder(config)
     progress_file = Path(folder) / 'runnote-inprogress.md'
     
-    # Read existing progress if it exists
-    existing_content = ""
-    if progress_file.exists():
-        with open(progress_file, 'r') as f:
-            existing_content = f.read()
-    
-    # Add new stage info
+    # Append the new stage info; earlier entries are left untouched
     timestamp = pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
     new_entry = f"\n## {stage} - {timestamp}\n{details}\n"
     
-    # Write updated content
-    with open(progress_file, 'w') as f:
-        f.write(existing_content + new_entry)
+    with open(progress_file, 'a') as f:
+        f.write(new_entry)
 
 def finalize_run_note(config, trade_factor_file_used):
     """Finalize run notes and create final runnote.md"""
@@ -85,11 +117,12 @@ def finalize_run_note(config, trade_factor_file_used):
         # Remove progress file
         progress_file.unlink()
 
-def create_trade_factor():
+def create_trade_factor(verbose=False):
     """
     Create trade_factor files based on trade flow type
     Domestic: creates both trade_factor.csv and trade_factor_lg.csv
     Others: creates only trade_factor.csv
+    verbose: print factor and relationship breakdowns for each file
     """
     config = load_config()
     is_domestic = config.get('TRADEFLOW', '').lower() == 'domestic'
@@ -100,12 +133,12 @@ def create_trade_factor():
     
     # Read the trade flows
     trade_path = get_file_path(config, 'industryflow')
-    trade_df = pd.read_csv(trade_path)
+    trade_df = read_csv_cached(trade_path, COEFFICIENT_TRADE_DTYPES)
     print(f"Loaded {len(trade_df)} trade flows from {trade_path}")
     
     # Read all factors
     factors_path = get_reference_file_path(config, 'factors')
-    factors_df = pd.read_csv(factors_path)
+    factors_df = read_reference_csv(factors_path, list(FACTOR_DTYPES)).astype(FACTOR_DTYPES)
     print(f"Loaded {len(factors_df)} factor definitions from {factors_path}")
     
     create_run_note(config, "Data Loading Complete", f"Trade flows: {len(trade_df)}, Factors: {len(factors_df)}")
@@ -115,13 +148,13 @@ def create_trade_factor():
         
         # Create standard version (selected factors)
         standard_factors = select_key_factors(factors_df, config['PROCESSING']['partial_factor_limit'])
-        standard_file = create_trade_factor_file(config, trade_df, standard_factors, 'trade_factor')
+        standard_file = create_trade_factor_file(config, trade_df, standard_factors, 'trade_factor', verbose)
         
         # Create comprehensive version (all factors)  
-        lg_file = create_trade_factor_file(config, trade_df, factors_df, 'trade_factor_domestic')
+        lg_file = create_trade_factor_file(config, trade_df, factors_df, 'trade_factor_domestic', verbose)
         
         # Use the lg version for downstream processing
-        used_file = config['FILES']['trade_factor_domestic']
+        used_file = get_output_filename(config, 'trade_factor_domestic')
         create_run_note(config, "Domestic Files Created", f"Standard: {standard_file}, Comprehensive: {lg_file}")
         
     else:
@@ -129,76 +162,115 @@ def create_trade_factor():
         
         # Create standard version only
         selected_factors = select_key_factors(factors_df, config['PROCESSING']['partial_factor_limit'])
-        standard_file = create_trade_factor_file(config, trade_df, selected_factors, 'trade_factor')
-        used_file = config['FILES']['trade_factor']
+        standard_file = create_trade_factor_file(config, trade_df, selected_factors, 'trade_factor', verbose)
+        used_file = get_output_filename(config, 'trade_factor')
         create_run_note(config, "Standard File Created", f"File: {standard_file}")
     
     finalize_run_note(config, used_file)
     return used_file
 
-def create_trade_factor_file(config, trade_df, factors_df, file_key):
+def create_trade_factor_file(config, trade_df, factors_df, file_key, verbose=False):
     """Create a single trade_factor file with specified factors"""
     
     # Use sample of trade flows for performance
     sample_size = min(config['PROCESSING']['sample_size'], len(trade_df))
-    sample_trades = trade_df.head(sample_size)
+    sample_trades = trade_df.iloc[:sample_size]
     
     print(f"Processing {len(sample_trades)} trade flows with {len(factors_df)} factors")
     
     # Show factor breakdown
-    extension_groups = factors_df.groupby('extension')
-    print(f"Factor extensions in {file_key}:")
-    for extension, group in extension_groups:
-        print(f"  {extension}: {len(group)} factors")
-    
-    trade_factor_list = []
-    np.random.seed(42)  # For reproducible results
-    
-    for _, trade_row in sample_trades.iterrows():
-        trade_id = trade_row['trade_id']
-        trade_amount = trade_row['amount']
-        industry1 = trade_row['industry1']
-        region1 = trade_row['region1']
-        
-        # Create coefficients for each factor
-        for _, factor_row in factors_df.iterrows():
-            factor_id = factor_row['factor_id']
-            factor_name = factor_row['stressor']
-            factor_extension = factor_row['extension']
-            factor_unit = factor_row['unit']
-            
-            # Generate realistic coefficients
-            coefficient = generate_coefficient(factor_extension, factor_name, industry1)
-            
-            if coefficient > 0:
-                impact_value = trade_amount * coefficient
-                
-                trade_factor_list.append({
-                    'trade_id': trade_id,
-                    'factor_id': factor_id,
-                    'coefficient': coefficient,
-                    'impact_value': impact_value
-                })
-    
-    # Create DataFrame and save
-    trade_factor_df = pd.DataFrame(trade_factor_list)
+    if verbose:
+        extension_groups = factors_df.groupby('extension')
+        print(f"Factor extensions in {file_key}:")
+        for extension, group in extension_groups:
+            print(f"  {extension}: {len(group)} factors")
+    
+    # Local generator seeded for reproducible results, leaving NumPy's global state alone
+    rng = np.random.default_rng(42)
     
     # Get output path
     folder = get_output_folder(config)
-    filename = config['FILES'][file_key]
+    filename = get_output_filename(config, file_key)
     output_path = f"{folder}/{filename}"
     
-    trade_factor_df.to_csv(output_path, index=False)
+    # Trade flows are processed and appended to the file in chunks, so memory
+    # stays bounded by chunk_size x n_factors however large sample_size is
+    chunk_size = config['PROCESSING'].get('chunk_size', 50000)
+    min_impact = config['PROCESSING'].get('min_impact_threshold', 0)
+    factor_ids = factors_df['factor_id'].to_numpy()
+    total_rows = 0
+    trades_covered = 0
+    factor_counts = np.zeros(len(factors_df), dtype=np.int64)
     
-    print(f"\n✅ Created {output_path} with {len(trade_factor_df)} factor-trade relationships")
+    # Arrow's writers format the numeric columns in C++ rather than cell by cell;
+    # Parquet (OUTPUT_FORMAT: parquet) is smaller and much faster to read back
+    if output_path.endswith('.parquet'):
+        writer = pq.ParquetWriter(output_path, TRADE_FACTOR_SCHEMA, compression='snappy')
+    else:
+        writer = pa_csv.CSVWriter(output_path, TRADE_FACTOR_SCHEMA)
     
-    if not trade_factor_df.empty:
-        print(f"Factors included: {trade_factor_df['factor_id'].nunique()} unique factors")
-        print(f"Trades covered: {trade_factor_df['trade_id'].nunique()} trade flows")
+    # Batches are written on a background thread (Arrow releases the GIL while
+    # formatting) so the next chunk is generated while the previous one is
+    # written; at most one batch waits, keeping memory bounded
+    pending_write = None
+    with writer, ThreadPoolExecutor(max_workers=1) as write_pool:
+        for start in range(0, len(sample_trades), chunk_size):
+            chunk = sample_trades.iloc[start:start + chunk_size]
+            
+            # Generate realistic coefficients for every (trade, factor) pair as one
+            # n_trades x n_factors matrix instead of a cross-joined frame
+            coefficients = generate_coefficients(
+                factors_df['extension'],
+                factors_df['stressor'],
+                chunk['industry1'],
+                rng
+            )
+            
+            # Gather the kept pairs by position; impacts are only computed (in
+            # float64) for those pairs
+            trade_idx, factor_idx = np.nonzero(coefficients > 0)
+            kept_coefficients = coefficients[trade_idx, factor_idx]
+            impact_values = chunk['amount'].to_numpy()[trade_idx] * kept_coefficients
+            
+            # Drop pairs below min_impact_threshold with one mask over the kept pairs
+            if min_impact > 0:
+                keep = np.abs(impact_values) > min_impact
+                trade_idx, factor_idx = trade_idx[keep], factor_idx[keep]
+                kept_coefficients, impact_values = kept_coefficients[keep], impact_values[keep]
+            
+            # The columns go straight into an Arrow record batch, without an
+            # intermediate DataFrame
+            batch = pa.RecordBatch.from_pydict({
+                'trade_id': chunk['trade_id'].to_numpy()[trade_idx],
+                'factor_id': factor_ids[factor_idx],
+                'coefficient': kept_coefficients,
+                'impact_value': impact_values
+            }, schema=TRADE_FACTOR_SCHEMA)
+            if pending_write is not None:
+                pending_write.result()
+            pending_write = write_pool.submit(writer.write_batch, batch)
+            
+            total_rows += batch.num_rows
+            if verbose:
+                trades_covered += len(np.unique(trade_idx))
+                factor_counts += np.bincount(factor_idx, minlength=len(factors_df))
+        
+        if pending_write is not None:
+            pending_write.result()
+    
+    print(f"\n✅ Created {output_path} with {total_rows} factor-trade relationships")
+    
+    if verbose and total_rows:
+        print(f"Factors included: {pd.unique(factor_ids[factor_counts > 0]).size} unique factors")
+        print(f"Trades covered: {trades_covered} trade flows")
         
         # Show breakdown by extension
-        extension_breakdown = trade_factor_df.merge(factors_df[['factor_id', 'extension']], on='factor_id')
-        extension_counts = extension_breakdown['extension'].value_counts()
+        extension_counts = (
+            pd.Series(factor_counts, index=factors_df['extension'].to_numpy())
+            .groupby(level=0).sum()
+            .sort_values(ascending=False, kind='stable')
+        )
+        extension_counts = extension_counts[extension_counts > 0]
         print(f"Breakdown by extension:")
         for extension, count in extension_counts.items():
             print(f"  {extension}: {count:,} relationships")
@@ -216,89 +288,96 @@ def select_key_factors(factors_df, limit):
         'Crop', 'Metal'     # Materials
     ]
     
-    selected_factors = []
+    # Rank each factor by the first priority pattern it matches (-1 = none)
+    pattern_masks = [
+        factors_df['stressor'].str.contains(pattern, case=False, na=False, regex=False)
+        for pattern in priority_patterns
+    ]
+    priority = np.select(pattern_masks, np.arange(len(priority_patterns)), default=-1)
     
-    # First, select factors matching priority patterns
-    for pattern in priority_patterns:
-        matching = factors_df[factors_df['stressor'].str.contains(pattern, case=False, na=False)]
-        selected_factors.append(matching)
-        if len(pd.concat(selected_factors).drop_duplicates()) >= limit:
-            break
-    
-    # Combine and deduplicate
-    if selected_factors:
-        result = pd.concat(selected_factors).drop_duplicates()
-    else:
-        result = factors_df.head(0)
+    # Keep matching factors ordered by pattern priority, then original order
+    matched = priority >= 0
+    result = factors_df[matched].iloc[np.argsort(priority[matched], kind='stable')]
     
     # If we don't have enough, add more from different extensions
     if len(result) < limit:
         remaining_needed = limit - len(result)
-        excluded_ids = result['factor_id'].tolist()
         
-        # Sample from each extension proportionally
-        extensions = factors_df['extension'].unique()
+        # Sample from each extension proportionally: the first per_extension
+        # factors not selected yet, extensions in order of first appearance
+        ext_codes, extensions = pd.factorize(factors_df['extension'], use_na_sentinel=False)
         per_extension = max(1, remaining_needed // len(extensions))
         
-        additional_factors = []
-        for ext in extensions:
-            ext_factors = factors_df[
-                (factors_df['extension'] == ext) & 
-                (~factors_df['factor_id'].isin(excluded_ids))
-            ]
-            if not ext_factors.empty:
-                sample_size = min(per_extension, len(ext_factors))
-                additional_factors.append(ext_factors.head(sample_size))
+        available = ~factors_df['factor_id'].isin(result['factor_id']).to_numpy() & factors_df['extension'].notna().to_numpy()
+        available_codes = ext_codes[available]
+        rank = pd.Series(available_codes).groupby(available_codes).cumcount().to_numpy()
+        positions = np.flatnonzero(available)[rank < per_extension]
+        positions = positions[np.argsort(ext_codes[positions], kind='stable')]
         
-        if additional_factors:
-            additional_df = pd.concat(additional_factors)
-            result = pd.concat([result, additional_df]).drop_duplicates()
+        if len(positions):
+            result = pd.concat([result, factors_df.iloc[positions]]).drop_duplicates()
     
     # Final trim to exact limit
     return result.head(limit)
 
-def generate_coefficient(extension, factor_name, industry):
-    """Generate realistic coefficients based on extension type, factor, and industry"""
-    if extension == 'air_emissions':
-        if any(gas in factor_name for gas in ['CO2', 'CH4', 'N2O']):
-            coeff = np.random.uniform(0.1, 2.0)
-            # Higher for energy/transport industries
-            if any(ind in industry for ind in ['ELECT', 'AIRTR', 'CRUDE']):
-                coeff *= 3.0
-        else:
-            coeff = np.random.uniform(0.001, 0.1)
-            
-    elif extension == 'employment':
-        if 'people' in factor_name.lower():
-            coeff = np.random.uniform(5, 50)  # People per million EUR
-        elif 'hours' in factor_name.lower():
-            coeff = np.random.uniform(1000, 10000)  # Hours per million EUR
-        else:
-            coeff = np.random.uniform(1, 100)
-            
-    elif extension == 'energy':
-        coeff = np.random.uniform(0.1, 2.0)  # TJ per million EUR
-        if any(ind in industry for ind in ['ELECT', 'CRUDE', 'BASIC']):
-            coeff *= 2.0
-            
-    elif extension == 'water':
-        coeff = np.random.uniform(0.001, 0.5)  # Mm3 per million EUR
-        if any(ind in industry for ind in ['AGRIC', 'FOOD', 'ELECT']):
-            coeff *= 3.0
-            
-    elif extension == 'land':
-        coeff = np.random.uniform(0.001, 0.1)  # km2 per million EUR
-        if any(ind in industry for ind in ['AGRIC', 'FORES']):
-            coeff *= 10.0
-            
-    elif extension == 'material':
-        coeff = np.random.uniform(0.1, 10.0)  # kt per million EUR
-        if any(ind in industry for ind in ['CRUDE', 'BASIC', 'METAL']):
-            coeff *= 3.0
-    else:
-        coeff = np.random.uniform(0.001, 1.0)
+def classify_factors(extension, factor_name):
+    """Return the COEFFICIENT_RULES index for each (extension, factor name) pair"""
+    codes, uniques = pd.factorize(pd.MultiIndex.from_arrays([extension.fillna(''), factor_name.fillna('')]))
+    unique_ext = pd.Series(uniques.get_level_values(0))
+    unique_name = pd.Series(uniques.get_level_values(1))
+    
+    conditions = []
+    for rule_ext, name_pattern, *_ in COEFFICIENT_RULES:
+        mask = np.ones(len(uniques), dtype=bool)
+        if rule_ext is not None:
+            mask &= (unique_ext == rule_ext).to_numpy()
+        if name_pattern is not None:
+            mask &= unique_name.str.contains(name_pattern).to_numpy()
+        conditions.append(mask)
+    
+    rule_codes = np.select(conditions, np.arange(len(COEFFICIENT_RULES)), default=len(COEFFICIENT_RULES) - 1)
+    return rule_codes[codes]
+
+def classify_industries(industry):
+    """Return per-element industry codes and a (n_industries x n_rules) boost table"""
+    codes, uniques = pd.factorize(industry.fillna(''))
+    unique_industry = pd.Series(uniques)
+    
+    boosted = np.zeros((len(uniques), len(COEFFICIENT_RULES)), dtype=bool)
+    for i, rule in enumerate(COEFFICIENT_RULES):
+        if rule[4]:
+            boosted[:, i] = unique_industry.str.contains('|'.join(rule[4])).to_numpy()
+    
+    return codes, boosted
+
+def generate_coefficients(extension, factor_name, industry, rng):
+    """Generate realistic coefficients based on extension type, factor, and industry
+    
+    Takes one Series per factor (extension, factor_name) and one per trade
+    (industry) and returns an (n_trades x n_factors) coefficient matrix. String
+    rules are evaluated once per distinct factor/industry and looked up by
+    integer code, then all coefficients are drawn from rng in a single call
+    and scaled in place
+    """
+    rule_codes = classify_factors(extension, factor_name)
+    industry_codes, boosted = classify_industries(industry)
+    
+    # float32 halves the memory traffic of the matrix; its ~7 significant
+    # digits are plenty for these generated coefficients
+    low = RULE_LOW[rule_codes].astype(np.float32)
+    high = RULE_HIGH[rule_codes].astype(np.float32)
+    
+    # Scale uniform draws into [low, high) in place, so the coefficient matrix
+    # and the boost mask are the only full-size arrays allocated
+    coefficients = rng.random((len(industry_codes), len(rule_codes)), dtype=np.float32)
+    coefficients *= high - low
+    coefficients += low
+    
+    # Higher intensity for energy/transport/agriculture/heavy industries
+    boost_mask = boosted[industry_codes[:, None], rule_codes[None, :]]
+    np.multiply(coefficients, RULE_BOOST[rule_codes].astype(np.float32), out=coefficients, where=boost_mask)
     
-    return coeff
+    return coefficients
 
 if __name__ == "__main__":
-    create_trade_factor()
\ No newline at end of file
+    create_trade_factor(verbose=True)
\ No newline at end of file
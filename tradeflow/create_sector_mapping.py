@@ -4,10 +4,103 @@ Create a mapping of Exiobase sectors to 5-character industry IDs
 """
 
 import pandas as pd
-import pymrio
+import numpy as np
 from pathlib import Path
 import re
 from config_loader import load_config, get_reference_file_path
+from exio_cache import read_exiobase_sectors
+
+# Sector categories by name keyword, checked in order; the first match wins
+SECTOR_CATEGORIES = [
+    ('Agriculture', ['crop', 'plant', 'agriculture', 'cattle', 'pig', 'poultry', 'meat', 'milk', 'wool', 'manure']),
+    ('Forestry', ['forestry', 'logging', 'wood', 'timber']),
+    ('Fishing', ['fish', 'fishing']),
+    ('Mining', ['coal', 'petroleum', 'crude', 'gas', 'mining', 'ore', 'anthracite', 'lignite']),
+    ('Food Manufacturing', ['food', 'beverage', 'tobacco', 'dairy']),
+    ('Textiles', ['textile', 'clothing', 'leather', 'wearing']),
+    ('Chemicals', ['chemical', 'pharmaceutical', 'plastic', 'rubber']),
+    ('Metals', ['metal', 'steel', 'iron', 'aluminum', 'fabricated']),
+    ('Machinery', ['machinery', 'equipment', 'computer', 'electronic']),
+    ('Transportation Equipment', ['transport', 'motor', 'vehicle', 'aircraft', 'ship']),
+    ('Construction', ['construction', 'building']),
+    ('Utilities', ['electricity', 'gas supply', 'water', 'steam']),
+    ('Trade', ['wholesale', 'retail', 'trade', 'repair']),
+    ('Transportation Services', ['transport', 'land', 'water', 'air', 'pipeline']),
+    ('Accommodation & Food', ['accommodation', 'hotel', 'restaurant', 'food service']),
+    ('Information', ['information', 'telecommunication', 'publishing', 'media']),
+    ('Finance & Insurance', ['financial', 'insurance', 'bank']),
+    ('Real Estate', ['real estate', 'rental', 'leasing']),
+    ('Professional Services', ['professional', 'technical', 'scientific', 'legal']),
+    ('Administrative Services', ['administrative', 'support', 'waste', 'management']),
+    ('Public Administration', ['public', 'administration', 'defence', 'government']),
+    ('Education', ['education', 'teaching']),
+    ('Health & Social', ['health', 'medical', 'social', 'care']),
+    ('Arts & Recreation', ['arts', 'entertainment', 'recreation', 'sport'])
+]
+
+def classify_sectors(sectors):
+    """Return the SECTOR_CATEGORIES category of each sector name"""
+    sector_lower = pd.Series(sectors, dtype=str).str.lower()
+    
+    # One regex scan per category over all sectors instead of per-sector term checks
+    masks = [
+        sector_lower.str.contains('|'.join(map(re.escape, terms))).to_numpy()
+        for _, terms in SECTOR_CATEGORIES
+    ]
+    return np.select(masks, [category for category, _ in SECTOR_CATEGORIES], default='Other Services')
+
+def make_industry_ids(sectors):
+    """Return a unique 5-character ID for each sector name, in order"""
+    # Create a 5-character ID based on the sector name
+    # First, remove common words and punctuation from all names at once
+    clean_names = (
+        pd.Series(sectors, dtype=str)
+        .str.replace(r'\b(and|of|related|to|services|products|nec|other)\b', '', case=False, regex=True)
+        .str.replace(r'[^\w\s]', '', regex=True)  # Remove punctuation
+        .str.strip()
+    )
+    
+    # Strategy 1: Use first 5 characters of cleaned name
+    candidate_ids = clean_names.str.replace(' ', '').str[:5].str.upper().tolist()
+    
+    # Strategies 2 and 3 only touch the few names that came out too short
+    for i, candidate_id in enumerate(candidate_ids):
+        if len(candidate_id) >= 5:
+            continue
+        
+        clean_name = clean_names.iloc[i]
+        words = clean_name.split()
+        
+        # Strategy 2: If too short, use acronym approach
+        if len(words) > 1:
+            # Create acronym from first letters of words
+            acronym = ''.join([word[0] for word in words if word])[:3].upper()
+            # Add numbers or partial words to reach 5 chars
+            candidate_id = (acronym + clean_name.replace(' ', '')[len(acronym):])[:5].upper()
+        
+        # Strategy 3: If still too short, pad with numbers
+        if len(candidate_id) < 5:
+            candidate_id = (candidate_id + str(i).zfill(5 - len(candidate_id)))[:5]
+        
+        candidate_ids[i] = candidate_id
+    
+    # Ensure uniqueness; a collision takes the next free numbered variant, so
+    # this pass stays sequential (a set lookup per sector)
+    used_ids = set()
+    for i, candidate_id in enumerate(candidate_ids):
+        original_candidate = candidate_id
+        counter = 1
+        while candidate_id in used_ids:
+            if counter < 10:
+                candidate_id = original_candidate[:4] + str(counter)
+            else:
+                candidate_id = original_candidate[:3] + str(counter).zfill(2)
+            counter += 1
+        
+        used_ids.add(candidate_id)
+        candidate_ids[i] = candidate_id
+    
+    return candidate_ids
 
 def create_sector_mapping():
     """
@@ -37,115 +130,19 @@ def create_sector_mapping():
             print(f"No Exiobase data files found for sector mapping (requested: {year}, checked: {fallback_year})")
             return
     
-    print(f"Loading Exiobase data from: {exio_file}")
-    exio_model = pymrio.parse_exiobase3(exio_file)
+    # Get all unique sectors, read from the Z.txt header rather than the whole model
+    print(f"Reading Exiobase sectors from: {exio_file}")
+    sectors = read_exiobase_sectors(exio_file)
     
-    # Get all unique sectors
-    sectors = exio_model.Z.index.get_level_values('sector').unique()
-    
-    sector_mapping = []
-    used_ids = set()
-    
-    for i, sector in enumerate(sectors):
-        sector_str = str(sector)
-        
-        # Create a 5-character ID based on the sector name
-        # First, try to extract meaningful characters
-        # Remove common words and get key terms
-        clean_name = re.sub(r'\b(and|of|related|to|services|products|nec|other)\b', '', sector_str, flags=re.IGNORECASE)
-        clean_name = re.sub(r'[^\w\s]', '', clean_name)  # Remove punctuation
-        clean_name = clean_name.strip()
-        
-        # Split into words and take first letters of important words
-        words = clean_name.split()
-        
-        # Strategy 1: Use first 5 characters of cleaned name
-        candidate_id = clean_name.replace(' ', '')[:5].upper()
-        
-        # Strategy 2: If too short, use acronym approach
-        if len(candidate_id) < 5 and len(words) > 1:
-            # Create acronym from first letters of words
-            acronym = ''.join([word[0] for word in words if word])[:3].upper()
-            # Add numbers or partial words to reach 5 chars
-            candidate_id = (acronym + clean_name.replace(' ', '')[len(acronym):])[:5].upper()
-        
-        # Strategy 3: If still too short, pad with numbers
-        if len(candidate_id) < 5:
-            candidate_id = (candidate_id + str(i).zfill(5 - len(candidate_id)))[:5]
-        
-        # Ensure uniqueness
-        original_candidate = candidate_id
-        counter = 1
-        while candidate_id in used_ids:
-            if counter < 10:
-                candidate_id = original_candidate[:4] + str(counter)
-            else:
-                candidate_id = original_candidate[:3] + str(counter).zfill(2)
-            counter += 1
-        
-        used_ids.add(candidate_id)
-        
-        # Determine sector category for additional metadata
-        sector_lower = sector_str.lower()
-        if any(term in sector_lower for term in ['crop', 'plant', 'agriculture', 'cattle', 'pig', 'poultry', 'meat', 'milk', 'wool', 'manure']):
-            category = 'Agriculture'
-        elif any(term in sector_lower for term in ['forestry', 'logging', 'wood', 'timber']):
-            category = 'Forestry'
-        elif any(term in sector_lower for term in ['fish', 'fishing']):
-            category = 'Fishing'
-        elif any(term in sector_lower for term in ['coal', 'petroleum', 'crude', 'gas', 'mining', 'ore', 'anthracite', 'lignite']):
-            category = 'Mining'
-        elif any(term in sector_lower for term in ['food', 'beverage', 'tobacco', 'dairy']):
-            category = 'Food Manufacturing'
-        elif any(term in sector_lower for term in ['textile', 'clothing', 'leather', 'wearing']):
-            category = 'Textiles'
-        elif any(term in sector_lower for term in ['chemical', 'pharmaceutical', 'plastic', 'rubber']):
-            category = 'Chemicals'
-        elif any(term in sector_lower for term in ['metal', 'steel', 'iron', 'aluminum', 'fabricated']):
-            category = 'Metals'
-        elif any(term in sector_lower for term in ['machinery', 'equipment', 'computer', 'electronic']):
-            category = 'Machinery'
-        elif any(term in sector_lower for term in ['transport', 'motor', 'vehicle', 'aircraft', 'ship']):
-            category = 'Transportation Equipment'
-        elif any(term in sector_lower for term in ['construction', 'building']):
-            category = 'Construction'
-        elif any(term in sector_lower for term in ['electricity', 'gas supply', 'water', 'steam']):
-            category = 'Utilities'
-        elif any(term in sector_lower for term in ['wholesale', 'retail', 'trade', 'repair']):
-            category = 'Trade'
-        elif any(term in sector_lower for term in ['transport', 'land', 'water', 'air', 'pipeline']):
-            category = 'Transportation Services'
-        elif any(term in sector_lower for term in ['accommodation', 'hotel', 'restaurant', 'food service']):
-            category = 'Accommodation & Food'
-        elif any(term in sector_lower for term in ['information', 'telecommunication', 'publishing', 'media']):
-            category = 'Information'
-        elif any(term in sector_lower for term in ['financial', 'insurance', 'bank']):
-            category = 'Finance & Insurance'
-        elif any(term in sector_lower for term in ['real estate', 'rental', 'leasing']):
-            category = 'Real Estate'
-        elif any(term in sector_lower for term in ['professional', 'technical', 'scientific', 'legal']):
-            category = 'Professional Services'
-        elif any(term in sector_lower for term in ['administrative', 'support', 'waste', 'management']):
-            category = 'Administrative Services'
-        elif any(term in sector_lower for term in ['public', 'administration', 'defence', 'government']):
-            category = 'Public Administration'
-        elif any(term in sector_lower for term in ['education', 'teaching']):
-            category = 'Education'
-        elif any(term in sector_lower for term in ['health', 'medical', 'social', 'care']):
-            category = 'Health & Social'
-        elif any(term in sector_lower for term in ['arts', 'entertainment', 'recreation', 'sport']):
-            category = 'Arts & Recreation'
-        else:
-            category = 'Other Services'
-        
-        sector_mapping.append({
-            'industry_id': candidate_id,
-            'name': sector_str,
-            'category': category
-        })
+    # Determine sector category for additional metadata
+    categories = classify_sectors(sectors)
     
     # Create DataFrame
-    df = pd.DataFrame(sector_mapping)
+    df = pd.DataFrame({
+        'industry_id': make_industry_ids(sectors),
+        'name': [str(sector) for sector in sectors],
+        'category': categories
+    })
     
     # Save to CSV
     output_file = get_reference_file_path(config, 'industries')
@@ -4,8 +4,19 @@ Debug script to check available regions in Exiobase data
 """
 
 import pandas as pd
-import pymrio
+import numpy as np
 from config_loader import load_config
+from exio_cache import parse_exiobase_cached
+
+def print_domestic_flows(Z, region):
+    """Print the count and range of non-zero domestic flows of one region"""
+    # One boolean mask over the block's NumPy array serves the count and the minimum
+    domestic_flows = Z.loc[(region,), (region,)].to_numpy()
+    positive = domestic_flows > 0
+    non_zero_domestic = int(positive.sum())
+    print(f"   Non-zero domestic flows: {non_zero_domestic}")
+    if non_zero_domestic > 0:
+        print(f"   Domestic flow range: {domestic_flows[positive].min():.6f} to {np.nanmax(domestic_flows):.2f}")
 
 def check_exiobase_regions():
     """Check what regions are available in Exiobase"""
@@ -13,7 +24,7 @@ def check_exiobase_regions():
     
     # Load Exiobase data
     exio_data_path = "exiobase_data/IOT_2019_pxp.zip"
-    exio_model = pymrio.parse_exiobase3(exio_data_path)
+    exio_model = parse_exiobase_cached(exio_data_path)
     
     # Get Z matrix regions
     Z = exio_model.Z
@@ -39,11 +50,7 @@ def check_exiobase_regions():
             print(f"✅ Found India as: '{variant}'")
             
             # Check domestic flows for this region
-            domestic_flows = Z.loc[(variant,), (variant,)]
-            non_zero_domestic = (domestic_flows > 0).sum().sum()
-            print(f"   Non-zero domestic flows: {non_zero_domestic}")
-            if non_zero_domestic > 0:
-                print(f"   Domestic flow range: {domestic_flows[domestic_flows > 0].min().min():.6f} to {domestic_flows.max().max():.2f}")
+            print_domestic_flows(Z, variant)
         else:
             print(f"❌ Not found as: '{variant}'")
     
@@ -53,11 +60,7 @@ def check_exiobase_regions():
             print(f"✅ Found US as: '{variant}'")
             
             # Check domestic flows for this region
-            domestic_flows = Z.loc[(variant,), (variant,)]
-            non_zero_domestic = (domestic_flows > 0).sum().sum()
-            print(f"   Non-zero domestic flows: {non_zero_domestic}")
-            if non_zero_domestic > 0:
-                print(f"   Domestic flow range: {domestic_flows[domestic_flows > 0].min().min():.6f} to {domestic_flows.max().max():.2f}")
+            print_domestic_flows(Z, variant)
         else:
             print(f"❌ Not found as: '{variant}'")
     
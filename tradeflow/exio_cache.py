@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Cached loading of parsed Exiobase models
+"""
+
+import pickle
+import zipfile
+from pathlib import Path
+
+import pandas as pd
+
+import pymrio
+
+def parse_exiobase_cached(exio_file):
+    """
+    Parse an Exiobase zip with pymrio, reusing a pickled copy of the model
+    stored next to the zip while it is newer than the zip itself
+    """
+    exio_file = Path(exio_file)
+    cache_file = exio_file.with_suffix('.pkl')
+
+    if cache_file.exists() and cache_file.stat().st_mtime >= exio_file.stat().st_mtime:
+        print(f"Loading cached Exiobase model: {cache_file}")
+        with open(cache_file, 'rb') as f:
+            return pickle.load(f)
+
+    exio_model = pymrio.parse_exiobase3(exio_file)
+
+    with open(cache_file, 'wb') as f:
+        pickle.dump(exio_model, f, protocol=5)
+
+    return exio_model
+
+def read_exiobase_sectors(exio_file):
+    """
+    Read the unique sector names of an Exiobase zip from the header rows of
+    its Z.txt, without parsing the model; falls back to the full (cached)
+    parse if the archive has no readable Z.txt
+    """
+    try:
+        with zipfile.ZipFile(exio_file) as archive:
+            z_name = min((name for name in archive.namelist() if Path(name).name == 'Z.txt'), key=len)
+            with archive.open(z_name) as f:
+                header = pd.read_csv(f, sep='\t', index_col=[0, 1], header=[0, 1], nrows=0)
+        return header.columns.get_level_values(1).unique()
+    except (ValueError, KeyError, zipfile.BadZipFile) as e:
+        print(f"Could not read sectors from Z.txt header ({e}), parsing the full model")
+        exio_model = parse_exiobase_cached(exio_file)
+        return exio_model.Z.index.get_level_values('sector').unique()
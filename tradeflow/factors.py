@@ -4,10 +4,64 @@ Extract all factors/flows from Exiobase extensions and create factor.csv
 """
 
 import pandas as pd
-import pymrio
+import numpy as np
 from pathlib import Path
-import uuid
 from config_loader import load_config, get_reference_file_path
+from exio_cache import parse_exiobase_cached
+
+# Context for stressors without a " - " qualifier, by extension
+EXTENSION_CONTEXTS = {
+    'employment': "economic/employment",
+    'energy': "natural_resource/energy",
+    'land': "natural_resource/land",
+    'material': "natural_resource/in_ground",
+    'water': "natural_resource/water"
+}
+
+def classify_contexts(stressors, ext_name):
+    """Return the context of each stressor name in one extension"""
+    ext_lower = ext_name.lower()
+    
+    # Stressors without a " - " qualifier are classified by extension only
+    has_qualifier = stressors.str.contains(" - ", regex=False).to_numpy()
+    default = EXTENSION_CONTEXTS.get(ext_name, "emission/air")
+    
+    # Otherwise the last " - " part decides, falling back on the extension
+    last_part = stressors.str.rsplit(" - ", n=1).str[-1].str.lower()
+    if "energy" in ext_lower:
+        fallback = "natural_resource/energy"
+    elif "material" in ext_lower:
+        fallback = "natural_resource/in_ground"
+    elif "employment" in ext_lower:
+        fallback = "economic/employment"
+    else:
+        fallback = f"emission/{ext_name}"
+    
+    is_land = stressors.str.lower().str.contains("land", regex=False).to_numpy() | ("land" in ext_lower)
+    contexts = np.select(
+        [
+            last_part.str.contains("air", regex=False).to_numpy(),
+            last_part.str.contains("water", regex=False).to_numpy(),
+            is_land
+        ],
+        ["emission/air", "emission/water", "natural_resource/land"],
+        default=fallback
+    )
+    
+    return np.where(has_qualifier, contexts, default)
+
+def build_extension_factors(ext_name, stressors, units_dict):
+    """Build the factor rows of one extension from its stressor names and units"""
+    stressors = pd.Series(stressors)
+    
+    return pd.DataFrame({
+        # For formats like "CO2 - combustion - air", take the first part
+        'name': stressors.str.split(" - ", n=1).str[0],
+        'context': classify_contexts(stressors, ext_name),
+        'unit': stressors.map(units_dict).fillna("unknown"),
+        'stressor': stressors,
+        'extension': ext_name
+    })
 
 def create_factors_csv():
     """
@@ -27,13 +81,12 @@ def create_factors_csv():
         return
     
     print(f"Loading Exiobase data from: {exio_file}")
-    exio_model = pymrio.parse_exiobase3(exio_file)
+    exio_model = parse_exiobase_cached(exio_file)
     
     # List of extension names to process
     extensions = ['air_emissions', 'employment', 'energy', 'land', 'material', 'water']
     
-    all_factors = []
-    factor_id = 1  # 1-based index
+    factor_frames = []
     
     for ext_name in extensions:
         if hasattr(exio_model, ext_name):
@@ -53,91 +106,36 @@ def create_factors_csv():
                     elif isinstance(units_df, pd.Series):
                         units_dict = units_df.to_dict()
                 
-                for stressor in stressors:
-                    # Extract context from stressor name
-                    context = "emission/air"  # default
-                    
-                    # Parse context from factor name
-                    if " - " in stressor:
-                        parts = stressor.split(" - ")
-                        if len(parts) >= 2:
-                            if "air" in parts[-1].lower():
-                                context = "emission/air"
-                            elif "water" in parts[-1].lower():
-                                context = "emission/water"
-                            elif "land" in ext_name.lower() or "land" in stressor.lower():
-                                context = "natural_resource/land"
-                            elif "energy" in ext_name.lower():
-                                context = "natural_resource/energy"
-                            elif "material" in ext_name.lower():
-                                context = "natural_resource/in_ground"
-                            elif "employment" in ext_name.lower():
-                                context = "economic/employment"
-                            else:
-                                context = f"emission/{ext_name}"
-                    elif ext_name == "employment":
-                        context = "economic/employment"
-                    elif ext_name == "energy":
-                        context = "natural_resource/energy"
-                    elif ext_name == "land":
-                        context = "natural_resource/land"
-                    elif ext_name == "material":
-                        context = "natural_resource/in_ground"
-                    elif ext_name == "water":
-                        context = "natural_resource/water"
-                    
-                    # Create flowable name (clean version of stressor name)
-                    flowable = stressor
-                    
-                    # Extract the main substance/flow name for flowable
-                    if " - " in stressor:
-                        # For formats like "CO2 - combustion - air", take the first part
-                        flowable = stressor.split(" - ")[0]
-                    
-                    # Get unit
-                    unit = units_dict.get(stressor, "unknown")
-                    
-                    # 'name': flowable,
-                    # 'context': context,
-                    # 'full_stressor_name': stressor,
-
-                    all_factors.append({
-                        'factor_id': factor_id,
-                        'unit': unit,
-                        'stressor': stressor,
-                        'extension': ext_name
-                    })
-                    
-                    factor_id += 1
-    
-    # Create DataFrame
-    factors_df = pd.DataFrame(all_factors)
-    
-    # Create the final factor.csv with only required columns
-    output_df = factors_df[['factor_id', 'unit', 'stressor', 'extension']].copy()
-    
-    # Save to CSV
+                factor_frames.append(build_extension_factors(ext_name, stressors, units_dict))
+    
+    # Create DataFrame with 1-based factor ids
+    factors_df = pd.concat(factor_frames, ignore_index=True)
+    factors_df.insert(0, 'factor_id', np.arange(1, len(factors_df) + 1))
+    
+    # Save the final factor.csv with only required columns, written straight
+    # from factors_df rather than from a copied subset
+    output_columns = ['factor_id', 'unit', 'stressor', 'extension']
     output_file = get_reference_file_path(config, 'factors')
-    output_df.to_csv(output_file, index=False)
+    factors_df.to_csv(output_file, index=False, columns=output_columns)
     
-    print(f"\nCreated {output_file} with {len(output_df)} factors")
+    print(f"\nCreated {output_file} with {len(factors_df)} factors")
     
     # Display summary
     print(f"\nFactors summary:")
-    print(f"Total factors: {len(output_df)}")
-    print(f"Contexts: {output_df['context'].nunique()}")
+    print(f"Total factors: {len(factors_df)}")
+    print(f"Contexts: {factors_df['context'].nunique()}")
     print(f"\nContext breakdown:")
-    print(output_df['context'].value_counts())
+    print(factors_df['context'].value_counts())
     
     print(f"\nFirst 15 factors:")
-    print(output_df.head(15).to_string(index=False))
+    print(factors_df[output_columns].head(15).to_string(index=False))
     
     # Also save detailed version for reference
     #detailed_file = get_reference_file_path(config, 'factors').replace('.csv', '_detailed.csv')
     #factors_df.to_csv(detailed_file, index=False)
     #print(f"\nAlso created {detailed_file} with additional metadata")
     
-    return output_df
+    return factors_df[output_columns]
 
 if __name__ == "__main__":
     create_factors_csv()
\ No newline at end of file
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Per-trade impact summaries shared by trade_impact.py and trade_resource.py
+"""
+
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Column types of trade.csv as carried into the per-trade summary files (all
+# its columns, repeated region and industry codes held as categoricals), and
+# of the trade_factor files
+SUMMARY_TRADE_DTYPES = {
+    'trade_id': 'int64',
+    'year': 'int64',
+    'region1': 'category',
+    'region2': 'category',
+    'industry1': 'category',
+    'industry2': 'category',
+    'amount': 'float64'
+}
+TRADE_FACTOR_DTYPES = {'trade_id': 'int32', 'factor_id': 'int32', 'coefficient': 'float32', 'impact_value': 'float64'}
+
+def attach_factor_metadata(trade_factor_df, factors_df):
+    """
+    Add the factors_df columns (unit, stressor, extension, ...) to each
+    trade_factor row
+    Looks each factor_id up in the factor index (a positional take) instead of
+    hash-joining the frames; unknown ids get NaN metadata as in a left merge.
+    The metadata columns come back as categoricals, so the later groupbys on
+    extension/context work on integer codes
+    """
+    metadata = factors_df.set_index('factor_id').astype('category').reindex(trade_factor_df['factor_id'])
+    return trade_factor_df.assign(**{col: metadata[col].array for col in metadata.columns})
+
+@lru_cache(maxsize=64)
+def _keyword_pattern(keywords):
+    """Compiled case-insensitive alternation of a tuple of keywords, built once per group"""
+    return re.compile('|'.join(keywords), re.IGNORECASE)
+
+def contains_any(values, keywords):
+    """
+    Boolean array: which values contain any of the keywords (case-insensitive)
+    The regex runs once per distinct value and is gathered back per row, as
+    trade_factor rows repeat the same few hundred stressor names
+    """
+    codes, uniques = pd.factorize(values)
+    pattern = _keyword_pattern(tuple(keywords))
+    matches = pd.Series(uniques, dtype=object).str.contains(pattern).to_numpy(dtype=bool)
+    
+    # Missing values (code -1) pick the appended False
+    return np.append(matches, False)[codes]
+
+def factorize_trades(factors_data):
+    """
+    One trade_id codebook for a set of factor rows: each row's trade code and
+    the distinct trade_ids in order of appearance; the per-trade summaries
+    below all accumulate into rows of this codebook, so their frames share
+    one index and line up without alignment
+    """
+    trade_codes, trade_ids = pd.factorize(factors_data['trade_id'])
+    return trade_codes, pd.Index(trade_ids, name='trade_id')
+
+def _impact_values(factors_data):
+    """impact_value as float64, with missing values as 0 so sums skip them like groupby"""
+    impacts = factors_data['impact_value'].to_numpy(dtype=np.float64)
+    return np.where(np.isnan(impacts), 0.0, impacts)
+
+def summarize_impacts(factors_data, columns, trades=None):
+    """
+    Total impact, relationship count and unique factor count per trade_id,
+    named by columns; returned indexed by trade_id, ready to join onto trades
+    """
+    # The sums and counts are accumulated with bincount over the trade codes
+    # (in order of appearance; the summary is only joined onto the trades),
+    # without hashing per group
+    trade_codes, trade_ids = trades if trades is not None else factorize_trades(factors_data)
+    has_impact = factors_data['impact_value'].notna().to_numpy()
+    summary = pd.DataFrame({
+        'sum': np.bincount(trade_codes, weights=_impact_values(factors_data), minlength=len(trade_ids)),
+        'count': np.bincount(trade_codes[has_impact], minlength=len(trade_ids))
+    }, index=trade_ids)
+    
+    # Each (trade, factor) pair is normally written once, so the unique factor
+    # count is just the group size; nunique only runs when pairs repeat
+    if factors_data.duplicated(['trade_id', 'factor_id']).any():
+        summary['unique'] = factors_data.groupby('trade_id', sort=False)['factor_id'].nunique()
+    else:
+        summary['unique'] = np.bincount(trade_codes, minlength=len(trade_ids))
+    summary = summary.round(3)
+    
+    # Flatten column names
+    summary.columns = columns
+    return summary
+
+def sum_impacts_by_category(factors_data, column, trades=None):
+    """
+    Sum impact_value per trade_id for each value of column (extension, context)
+    Returns a trade_id x value frame, 0 where a trade has no impacts of a value,
+    like groupby(['trade_id', column]).sum().unstack(fill_value=0); the values
+    are factorized and every cell is accumulated in one bincount pass
+    """
+    trade_codes, trade_ids = trades if trades is not None else factorize_trades(factors_data)
+    
+    # Columns follow the lexical order of the values, as when grouping on the
+    # strings; a categorical's own category order is not used, so its distinct
+    # values are sorted and the codes remapped to that order
+    category_codes, categories = pd.factorize(factors_data[column])
+    categories = np.asarray(categories, dtype=object)
+    order = np.argsort(categories, kind='stable')
+    rank = np.empty(len(order), dtype=np.intp)
+    rank[order] = np.arange(len(order))
+    category_codes = np.where(category_codes >= 0, rank[category_codes], -1)
+    categories = categories[order]
+    
+    # Rows with a missing value are left out, as groupby drops NaN keys
+    valid = category_codes >= 0
+    cells = trade_codes[valid] * len(categories) + category_codes[valid]
+    sums = np.bincount(
+        cells,
+        weights=_impact_values(factors_data)[valid],
+        minlength=len(trade_ids) * len(categories)
+    ).reshape(len(trade_ids), len(categories))
+    
+    # Only values that occur become columns (observed=True)
+    observed = np.bincount(category_codes[valid], minlength=len(categories)) > 0
+    return pd.DataFrame(
+        sums[:, observed],
+        index=trade_ids,
+        columns=pd.Index(categories[observed], name=column)
+    )
+
+def sum_impacts_by_keywords(factors_data, keyword_groups, column_prefix='', trades=None):
+    """
+    Sum impact_value per trade_id for each group of stressor keywords
+    Returns a frame indexed by trade_id with a column per group that matched
+    A factor counts towards every group it matches, so each matched group is
+    summed with its own bincount over the trade codes
+    """
+    trade_codes, trade_ids = trades if trades is not None else factorize_trades(factors_data)
+    
+    # Find factors that contain any of the specified names, per group
+    masks = np.column_stack([
+        contains_any(factors_data['stressor'], keywords) for keywords in keyword_groups.values()
+    ])
+    matched = masks.any(axis=0)
+    
+    impacts = _impact_values(factors_data)
+    group_impacts = pd.DataFrame({
+        column_prefix + name: np.bincount(trade_codes, weights=np.where(mask, impacts, 0.0), minlength=len(trade_ids))
+        for name, mask, has_match in zip(keyword_groups, masks.T, matched) if has_match
+    }, index=trade_ids)
+    
+    return group_impacts.round(3)
+
+def impact_intensity(total, amount):
+    """
+    Impact per unit of trade amount, rounded to 6 decimals, computed on the
+    NumPy arrays in one pass; division by a zero amount gives 0 instead of inf
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        intensity = total.to_numpy(dtype=np.float64) / amount.to_numpy(dtype=np.float64)
+    intensity[np.isinf(intensity)] = 0
+    return intensity.round(6)
@@ -10,7 +10,7 @@ import sys
 import time
 import yaml
 from pathlib import Path
-from config_loader import load_config
+from config_loader import load_config, get_output_filename
 
 # Set UTF-8 encoding for Windows console
 import os
@@ -390,9 +390,10 @@ def create_runnote(country, tradeflow, start_time, total_time, success_count, to
     # Ensure the directory exists
     runnote_path.parent.mkdir(parents=True, exist_ok=True)
     
-    # Check which files actually exist
-    expected_files = ['trade.csv', 'trade_factor.csv', 'trade_impact.csv', 
-                     'trade_employment.csv', 'trade_resource.csv', 'trade_material.csv']
+    # Check which files actually exist, under their configured formats
+    expected_files = [get_output_filename(config, file_key) for file_key in
+                      ['industryflow', 'trade_factor', 'trade_impact',
+                       'trade_employment', 'trade_resource', 'trade_material']]
     
     existing_files = []
     missing_files = []
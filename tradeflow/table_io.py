@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Read and write tables as CSV or Parquet, chosen by file suffix
+"""
+
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.dataset as ds
+
+def read_table(path, dtype=None, row_filter=None):
+    """
+    Read a .parquet or .csv file into a DataFrame, optionally with column dtypes
+    row_filter: optional pyarrow.dataset expression; rows that fail it are
+    dropped batch by batch while the file is scanned, so only matching rows
+    are ever held in memory
+    """
+    if str(path).endswith('.parquet'):
+        df = pd.read_parquet(path, filters=row_filter)
+        return df.astype(dtype) if dtype else df
+    if row_filter is None:
+        return pd.read_csv(path, engine='pyarrow', dtype=dtype)
+    
+    # Numeric columns are parsed straight into their final types, as the
+    # pyarrow engine of read_csv does
+    column_types = {
+        col: pa.from_numpy_dtype(np.dtype(col_type))
+        for col, col_type in (dtype or {}).items() if pd.api.types.is_numeric_dtype(col_type)
+    }
+    csv_format = ds.CsvFileFormat(convert_options=pa_csv.ConvertOptions(column_types=column_types))
+    df = ds.dataset(path, format=csv_format).to_table(filter=row_filter).to_pandas()
+    return df.astype(dtype) if dtype else df
+
+def write_table(df, path):
+    """
+    Write a DataFrame to a .parquet (snappy compressed) or .csv file
+    """
+    if str(path).endswith('.parquet'):
+        df.to_parquet(path, compression='snappy', index=False)
+    else:
+        df.to_csv(path, index=False)
+
+def _read_via_parquet(path, mtime_ns, columns=None):
+    """
+    Load a CSV through a Parquet copy stored next to it, rewritten from the
+    CSV whenever the CSV is newer (mtime_ns)
+    """
+    cache_file = Path(path).with_suffix('.parquet')
+    if cache_file.exists() and cache_file.stat().st_mtime_ns >= mtime_ns:
+        return pd.read_parquet(cache_file, columns=columns)
+    
+    df = pd.read_csv(path, engine='pyarrow')
+    df.to_parquet(cache_file, index=False)
+    return df[columns] if columns is not None else df
+
+@lru_cache(maxsize=4)
+def _read_reference(path, mtime_ns):
+    """
+    Load a reference CSV through its Parquet copy; cached per file
+    modification time
+    """
+    return _read_via_parquet(path, mtime_ns)
+
+def read_csv_cached(path, dtype):
+    """
+    Read the dtype columns of a CSV such as trade.csv, which several scripts
+    read in turn after it is written; the first read leaves a Parquet copy
+    next to it that later reads use until the CSV changes
+    """
+    df = _read_via_parquet(str(path), Path(path).stat().st_mtime_ns, list(dtype))
+    return df.astype(dtype)
+
+def read_reference_csv(path, columns=None):
+    """
+    Read a static reference CSV such as factor.csv
+    Repeat loads in a process are served from memory and later runs from a
+    Parquet copy, both refreshed when the CSV changes; each caller gets its
+    own copy
+    """
+    df = _read_reference(str(path), Path(path).stat().st_mtime_ns)
+    if columns is not None:
+        return df[columns].copy()
+    return df.copy()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Test that the per-trade impact summaries match the pandas groupby results they replace
+"""
+
+import numpy as np
+import pandas as pd
+from impact_summary import sum_impacts_by_category
+
+def make_factors_data(n=5000, seed=0):
+    """Random trade_factor rows with an extension column holding some missing values"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'trade_id': rng.integers(1, 300, n).astype('int32'),
+        'extension': rng.choice(['water', 'land', 'material', 'energy', None], n),
+        'impact_value': rng.lognormal(0, 3, n)
+    })
+
+def test_category_columns_match_groupby():
+    """Columns, their order and values match groupby(...).sum().unstack(fill_value=0) on the strings"""
+    factors_data = make_factors_data()
+    expected = factors_data.groupby(['trade_id', 'extension'])['impact_value'].sum().unstack(fill_value=0)
+
+    # Plain strings, and a categorical whose category order is not lexical
+    # (as produced by mapping another categorical column)
+    categorical = factors_data.assign(extension=pd.Categorical(
+        factors_data['extension'], categories=['water', 'material', 'land', 'energy', 'employment']
+    ))
+    for data in [factors_data, categorical]:
+        result = sum_impacts_by_category(data, 'extension')
+        assert list(result.columns) == list(expected.columns), list(result.columns)
+        result = result.reindex(expected.index)
+        assert np.allclose(result.to_numpy(), expected.to_numpy(), rtol=1e-12, atol=0)
+
+    print("Category columns:", list(expected.columns))
+
+if __name__ == "__main__":
+    test_category_columns_match_groupby()
@@ -39,6 +39,9 @@ from pathlib import Path
 import pickle as pkl
 import argparse
 from config_loader import load_config, get_file_path, get_reference_file_path, print_config_summary
+from exio_cache import parse_exiobase_cached
+from table_io import write_table, read_reference_csv
+from impact_summary import contains_any
 
 class ExiobaseTradeFlow:
     def __init__(self, use_large_factors=False):
@@ -135,8 +138,9 @@ class ExiobaseTradeFlow:
         selected_factors = priority_factors.get(ext_name, [])
         
         if selected_factors:
-            # Filter by priority factors first
-            priority_mask = F_stacked['flowable'].str.contains('|'.join(selected_factors), case=False, na=False)
+            # Filter by priority factors first; each flowable repeats once per
+            # region/sector column, so the pattern is matched per distinct name
+            priority_mask = contains_any(F_stacked['flowable'], selected_factors)
             priority_data = F_stacked[priority_mask].copy()
             
             # If we still have too many, select top ones by coefficient magnitude
@@ -166,11 +170,11 @@ class ExiobaseTradeFlow:
         Apply scaling factors to coefficients based on factor units to fix unrealistic values
         """
         # Make a copy to avoid modifying original data
-        F_scaled = F_stacked.copy()
+        F_scaled = F_stacked.reset_index(drop=True)
         
-        # Merge with factor metadata to get units (left merge preserves all original rows)
-        factor_units = factors_df[['factor_id', 'unit', 'extension']].drop_duplicates('factor_id')
-        F_with_units = F_scaled.merge(factor_units, on='factor_id', how='left')
+        # Look up each row's unit by factor_id instead of merging in the factor metadata
+        factor_units = factors_df.drop_duplicates('factor_id').set_index('factor_id')['unit']
+        units = F_scaled['factor_id'].map(factor_units).to_numpy()
         
         # Define scaling factors by unit type to convert to realistic per-dollar impacts
         scaling_factors = {
@@ -188,14 +192,13 @@ class ExiobaseTradeFlow:
         
         # Apply scaling factors
         for unit, scale_factor in scaling_factors.items():
-            mask = F_with_units['unit'] == unit
+            mask = units == unit
             if mask.any():
                 original_count = mask.sum()
-                F_with_units.loc[mask, 'coefficient'] *= scale_factor
+                F_scaled.loc[mask, 'coefficient'] *= scale_factor
                 print(f"    Scaled {original_count} coefficients with unit '{unit}' by {scale_factor}")
         
-        # Return the scaled data with original columns structure
-        return F_with_units[F_stacked.columns.tolist()]
+        return F_scaled
 
     def create_trade_factor(self, trade_df, exio_model):
         """
@@ -206,7 +209,7 @@ class ExiobaseTradeFlow:
         try:
             # Load the factors mapping
             factors_file = get_reference_file_path(self.config, 'factors')
-            factors_df = pd.read_csv(factors_file)
+            factors_df = read_reference_csv(factors_file)
             
             # Create a mapping from factor names to factor_ids
             # Extract factor names from stressor column (format: "CO2 - combustion - air")
@@ -231,6 +234,7 @@ class ExiobaseTradeFlow:
             
             extensions = ['air_emissions', 'employment', 'energy', 'land', 'material', 'water']
             
+            # One typed frame per extension, concatenated once at the end
             all_trade_factor = []
             
             for ext_name in extensions:
@@ -334,35 +338,35 @@ class ExiobaseTradeFlow:
                             # Convert to int only after removing NaN values
                             if not trade_factor_subset.empty:
                                 trade_factor_subset['factor_id'] = trade_factor_subset['factor_id'].astype(int)
-                            
-                            all_trade_factor.extend(trade_factor_subset.to_dict('records'))
+                                all_trade_factor.append(trade_factor_subset)
             
             # Create DataFrame and save
             if all_trade_factor:
-                trade_factor_df = pd.DataFrame(all_trade_factor)
+                trade_factor_df = pd.concat(all_trade_factor, ignore_index=True)
                 
                 # Determine output file based on mode
+                output_file = get_file_path(self.config, 'trade_factor')
+                suffix = Path(output_file).suffix
                 if self.use_large_factors:
-                    output_file = get_file_path(self.config, 'trade_factor')
-                    if not output_file.endswith('_lg.csv'):
-                        output_file = output_file.replace('.csv', '_lg.csv')
+                    if not output_file.endswith('_lg' + suffix):
+                        output_file = output_file.replace(suffix, '_lg' + suffix)
                     file_type = "large"
                     print(f"⚠️  WARNING: Creating large trade_factor_lg.csv (~1.5GB) - this may cause memory issues in trade_resource.py")
                 else:
-                    output_file = get_file_path(self.config, 'trade_factor')
-                    if output_file.endswith('_lg.csv'):
-                        output_file = output_file.replace('_lg.csv', '.csv')
+                    if output_file.endswith('_lg' + suffix):
+                        output_file = output_file.replace('_lg' + suffix, suffix)
                     file_type = "small"
                 
-                trade_factor_df.to_csv(output_file, index=False)
+                write_table(trade_factor_df, output_file)
                 print(f"Created {file_type} trade_factor file with {len(trade_factor_df)} factor-trade relationships")
                 print(f"File: {output_file}")
             else:
                 print("No trade-factor relationships found, creating empty trade_factor.csv")
                 output_file = get_file_path(self.config, 'trade_factor')
-                if output_file.endswith('_lg.csv'):
-                    output_file = output_file.replace('_lg.csv', '.csv')
-                pd.DataFrame(columns=['trade_id', 'factor_id', 'coefficient', 'impact_value']).to_csv(output_file, index=False)
+                suffix = Path(output_file).suffix
+                if output_file.endswith('_lg' + suffix):
+                    output_file = output_file.replace('_lg' + suffix, suffix)
+                write_table(pd.DataFrame(columns=['trade_id', 'factor_id', 'coefficient', 'impact_value']), output_file)
                 
         except Exception as e:
             print(f"Error creating trade_factor.csv: {e}")
@@ -375,35 +379,27 @@ class ExiobaseTradeFlow:
         print("Creating simplified trade_factor.csv with sample data...")
         
         try:
-            # Create sample factor relationships for major flows
-            sample_factors = []
+            # Sample some common factors with realistic coefficient ranges
+            common_factor_ids = np.array([1, 5, 7, 15])  # As, CH4, CO2, N2O
+            low = np.array([0.001, 0.01, 0.1, 0.001])
+            high = np.array([0.05, 0.1, 2.0, 0.05])
             
-            # Sample some common factors
-            common_factor_ids = [1, 5, 7, 15]  # As, CH4, CO2, N2O
+            # Pair each trade flow with every factor using plain arrays rather
+            # than a Series per row
+            sample_trades = trade_df.head(100)  # Limit to first 100 for performance
+            n_trades, n_factors = len(sample_trades), len(common_factor_ids)
             
-            # For each trade flow, create sample factor relationships
-            for _, trade_row in trade_df.head(100).iterrows():  # Limit to first 100 for performance
-                for factor_id in common_factor_ids:
-                    # Create realistic sample coefficients
-                    if factor_id == 7:  # CO2
-                        coefficient = np.random.uniform(0.1, 2.0)
-                    elif factor_id == 5:  # CH4  
-                        coefficient = np.random.uniform(0.01, 0.1)
-                    else:
-                        coefficient = np.random.uniform(0.001, 0.05)
-                    
-                    impact_value = trade_row['amount'] * coefficient
-                    
-                    sample_factors.append({
-                        'trade_id': trade_row['trade_id'],
-                        'factor_id': factor_id,
-                        'coefficient': coefficient,
-                        'impact_value': impact_value
-                    })
+            rng = np.random.default_rng(42)  # For reproducible results
+            coefficient = rng.uniform(np.tile(low, n_trades), np.tile(high, n_trades))
             
-            trade_factor_df = pd.DataFrame(sample_factors)
+            trade_factor_df = pd.DataFrame({
+                'trade_id': np.repeat(sample_trades['trade_id'].to_numpy(), n_factors),
+                'factor_id': np.tile(common_factor_ids, n_trades),
+                'coefficient': coefficient,
+                'impact_value': np.repeat(sample_trades['amount'].to_numpy(), n_factors) * coefficient
+            })
             output_file = get_file_path(self.config, 'trade_factor')
-            trade_factor_df.to_csv(output_file, index=False)
+            write_table(trade_factor_df, output_file)
             print(f"Created sample trade_factor.csv with {len(trade_factor_df)} relationships")
             
         except Exception as e:
@@ -459,7 +455,7 @@ class ExiobaseTradeFlow:
         # Parse the downloaded Exiobase data
         try:
             print(f"Parsing Exiobase file: {exio_file}")
-            exio_model = pymrio.parse_exiobase3(exio_file)
+            exio_model = parse_exiobase_cached(exio_file)
             return exio_model
         except Exception as e:
             print(f"Parsing failed: {e}")
@@ -581,12 +577,12 @@ class ExiobaseTradeFlow:
                       'STONE', 'SAND1', 'CLAY1', 'CHEMI', 'SALT1', 'OTHER', 'PETRE', 'NATUR',
                       'OTHER', 'MEAT1', 'MEAT2']
         
-        np.random.seed(42)  # For reproducible results
+        rng = np.random.default_rng(42)  # For reproducible results
         
-        data = []
+        # Region pairs to include, based on the tradeflow type
+        region_pairs = []
         for region1 in regions:
             for region2 in regions:
-                # Apply filtering based on tradeflow type
                 if self.tradeflow_type == 'imports':
                     if region2 != self.country or region1 == self.country:
                         continue
@@ -596,38 +592,45 @@ class ExiobaseTradeFlow:
                 elif self.tradeflow_type == 'domestic':
                     if region1 != self.country or region2 != self.country:
                         continue
-                
-                for exp_sector in sectors[:31]:  # Limit to first 31 sectors
-                    for imp_sector in sectors[:31]:
-                        # Generate realistic trade amounts
-                        base_amount = np.random.lognormal(8, 2.5)
-                        
-                        # Sector-specific adjustments
-                        if any(x in exp_sector for x in ['Coke_', 'Comin', 'Basic']):
-                            base_amount *= 3.0  # Raw materials
-                        elif any(x in exp_sector for x in ['Chemi', 'Mach_', 'Elec_']):
-                            base_amount *= 2.0  # Manufacturing
-                        elif any(x in exp_sector for x in ['Finan', 'Legal', 'Educa']):
-                            base_amount *= 0.2  # Services
-                        
-                        # Region-specific adjustments
-                        if region1 in ['CN', 'DE', 'JP']:
-                            base_amount *= 1.8
-                        elif region1 in ['CA', 'MX']:
-                            base_amount *= 1.3
-                        
-                        # Only include significant flows
-                        if base_amount > 0.1:
-                            data.append({
-                                'year': self.year,
-                                'region1': region1,
-                                'region2': region2,
-                                'industry1': exp_sector,
-                                'industry2': imp_sector,
-                                'amount': round(base_amount, 2)
-                            })
-        
-        df = pd.DataFrame(data)
+                region_pairs.append((region1, region2))
+        
+        trade_sectors = np.array(sectors[:31])  # Limit to first 31 sectors
+        n_sectors = len(trade_sectors)
+        
+        # Sector-specific adjustments, evaluated once per sector
+        sector_mult = np.ones(n_sectors)
+        for i, exp_sector in enumerate(trade_sectors):
+            if any(x in exp_sector for x in ['Coke_', 'Comin', 'Basic']):
+                sector_mult[i] = 3.0  # Raw materials
+            elif any(x in exp_sector for x in ['Chemi', 'Mach_', 'Elec_']):
+                sector_mult[i] = 2.0  # Manufacturing
+            elif any(x in exp_sector for x in ['Finan', 'Legal', 'Educa']):
+                sector_mult[i] = 0.2  # Services
+        
+        # Region-specific adjustments, looked up once per region pair
+        region_mult = {'CN': 1.8, 'DE': 1.8, 'JP': 1.8, 'CA': 1.3, 'MX': 1.3}
+        pair_mult = np.array([region_mult.get(region1, 1.0) for region1, _ in region_pairs])
+        
+        # Generate realistic trade amounts for every (region pair, exporting sector,
+        # importing sector) in one draw, in the same order as the nested loops
+        amounts = rng.lognormal(8, 2.5, size=(len(region_pairs), n_sectors, n_sectors))
+        amounts *= sector_mult[None, :, None]
+        amounts *= pair_mult[:, None, None]
+        
+        # Only include significant flows
+        pair_idx, exp_idx, imp_idx = np.nonzero(amounts > 0.1)
+        pair_regions = np.array(region_pairs, dtype=object).reshape(-1, 2)
+        
+        df = pd.DataFrame({
+            'year': self.year,
+            'region1': pair_regions[pair_idx, 0],
+            'region2': pair_regions[pair_idx, 1],
+            'industry1': trade_sectors[exp_idx],
+            'industry2': trade_sectors[imp_idx],
+            'amount': amounts[pair_idx, exp_idx, imp_idx]
+        })
+        # Round all amounts in one vectorized pass
+        df['amount'] = df['amount'].round(2)
         # Add trade_id for fallback data
         df['trade_id'] = df.index + 1
         # Reorder columns
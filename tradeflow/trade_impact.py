@@ -3,13 +3,20 @@
 Create trade_impact.csv that shows total environmental impacts per trade transaction
 """
 
+import argparse
 import pandas as pd
 import numpy as np
 from config_loader import load_config, get_file_path, get_reference_file_path, print_config_summary
+from table_io import read_table, write_table, read_csv_cached, read_reference_csv
+from impact_summary import SUMMARY_TRADE_DTYPES, TRADE_FACTOR_DTYPES, attach_factor_metadata, factorize_trades, summarize_impacts, sum_impacts_by_category, sum_impacts_by_keywords, impact_intensity
 
-def create_trade_impact():
+# factor.csv columns used for the metadata merge
+FACTOR_COLUMNS = ['factor_id', 'unit', 'extension', 'stressor']
+
+def create_trade_impact(verbose=False):
     """
     Create trade_impact.csv by aggregating environmental impacts per trade transaction
+    verbose: print the top flows, impact breakdowns and column list
     """
     # Load configuration
     config = load_config()
@@ -19,43 +26,35 @@ def create_trade_impact():
     
     # Read the trade flows
     trade_file = get_file_path(config, 'industryflow')
-    trade_df = pd.read_csv(trade_file)
+    trade_df = read_csv_cached(trade_file, SUMMARY_TRADE_DTYPES)
     print(f"Loaded {len(trade_df)} trade flows")
     
     # Read the trade factors (environmental coefficients and impacts)
     trade_factor_file = get_file_path(config, 'trade_factor')
-    trade_factor_df = pd.read_csv(trade_factor_file)
+    trade_factor_df = read_table(trade_factor_file, TRADE_FACTOR_DTYPES)
     print(f"Loaded {len(trade_factor_df)} trade-factor relationships")
     
     # Read the factors metadata for units and extension
     factors_file = get_reference_file_path(config, 'factors')
-    factors_df = pd.read_csv(factors_file)
+    factors_df = read_reference_csv(factors_file, FACTOR_COLUMNS)
     print(f"Loaded {len(factors_df)} factor definitions")
     
     # Merge trade_factor with factor metadata
     print("Merging trade factors with metadata...")
-    enhanced_factors = trade_factor_df.merge(
-        factors_df[['factor_id', 'unit', 'extension', 'stressor']], 
-        on='factor_id', 
-        how='left'
-    )
+    enhanced_factors = attach_factor_metadata(trade_factor_df, factors_df)
     
     print("Calculating impact summaries by trade transaction...")
     
-    # Group by trade_id and calculate summary statistics
-    impact_summary = enhanced_factors.groupby('trade_id').agg({
-        'impact_value': ['sum', 'count'],
-        'factor_id': 'nunique'
-    }).round(3)
+    # Factorize trade_id once; every summary below accumulates into its codes
+    trades = factorize_trades(enhanced_factors)
     
-    # Flatten column names
-    impact_summary.columns = ['total_impact_value', 'factor_count', 'unique_factors']
-    impact_summary = impact_summary.reset_index()
+    # Group by trade_id and calculate summary statistics
+    impact_summary = summarize_impacts(enhanced_factors, ['total_impact_value', 'factor_count', 'unique_factors'], trades)
     
     # Calculate impact by extension (air_emissions, water, etc.)
     print("Calculating impacts by environmental extension...")
     
-    extension_impacts = enhanced_factors.groupby(['trade_id', 'extension'])['impact_value'].sum().unstack(fill_value=0)
+    extension_impacts = sum_impacts_by_category(enhanced_factors, 'extension', trades)
     extension_impacts = extension_impacts.round(3)
     
     # Calculate impact by major factor types
@@ -73,57 +72,31 @@ def create_trade_impact():
         'Land_total': ['Cropland', 'Forest', 'Artificial Surfaces']
     }
     
-    factor_type_impacts = pd.DataFrame(index=enhanced_factors['trade_id'].unique())
-    
-    for factor_type, factor_names in major_factors.items():
-        # Find factors that contain any of the specified names
-        matching_factors = enhanced_factors[
-            enhanced_factors['stressor'].str.contains('|'.join(factor_names), case=False, na=False)
-        ]
-        
-        if not matching_factors.empty:
-            type_impact = matching_factors.groupby('trade_id')['impact_value'].sum()
-            factor_type_impacts[factor_type] = type_impact
-    
-    factor_type_impacts = factor_type_impacts.fillna(0).round(3)
+    factor_type_impacts = sum_impacts_by_keywords(enhanced_factors, major_factors, trades=trades)
     
     # Merge all impact data with original trade information
     print("Merging with trade flow data...")
     
-    trade_impact = trade_df.merge(impact_summary, on='trade_id', how='left')
-    
-    # Add extension-based impacts
-    if not extension_impacts.empty:
-        trade_impact = trade_impact.merge(
-            extension_impacts.reset_index(), 
-            on='trade_id', 
-            how='left'
-        )
-    
-    # Add factor-type impacts
-    if not factor_type_impacts.empty:
-        factor_type_impacts_reset = factor_type_impacts.reset_index()
-        factor_type_impacts_reset = factor_type_impacts_reset.rename(columns={'index': 'trade_id'})
-        trade_impact = trade_impact.merge(
-            factor_type_impacts_reset, 
-            on='trade_id', 
-            how='left'
-        )
+    # Every summary is indexed by the same trade_ids, so they are put side by
+    # side and joined onto the trades in a single pass
+    trade_impact = trade_df.join(
+        pd.concat([impact_summary, extension_impacts, factor_type_impacts], axis=1),
+        on='trade_id'
+    )
     
     # Fill NaN values with 0 for impact columns
     impact_columns = [col for col in trade_impact.columns if col not in ['trade_id', 'year', 'region1', 'region2', 'industry1', 'industry2', 'amount']]
     trade_impact[impact_columns] = trade_impact[impact_columns].fillna(0)
     
     # Calculate impact intensity (total impact per million USD of trade)
-    trade_impact['impact_intensity'] = (trade_impact['total_impact_value'] / trade_impact['amount']).round(6)
-    trade_impact['impact_intensity'] = trade_impact['impact_intensity'].replace([np.inf, -np.inf], 0)
+    trade_impact['impact_intensity'] = impact_intensity(trade_impact['total_impact_value'], trade_impact['amount'])
     
     # Sort by total impact value descending
     trade_impact = trade_impact.sort_values('total_impact_value', ascending=False)
     
-    # Save to CSV
+    # Save as CSV, or Parquet when SUMMARY_FORMAT is parquet
     output_file = get_file_path(config, 'trade_impact')
-    trade_impact.to_csv(output_file, index=False)
+    write_table(trade_impact, output_file)
     
     print(f"\nCreated trade_impact.csv with {len(trade_impact)} trade transactions")
     
@@ -134,21 +107,31 @@ def create_trade_impact():
     print(f"Average factors per trade: {trade_impact['factor_count'].mean():.1f}")
     print(f"Total environmental impact value: {trade_impact['total_impact_value'].sum():,.0f}")
     
+    if verbose:
+        print_impact_breakdowns(trade_impact)
+    
+    return trade_impact
+
+def print_impact_breakdowns(trade_impact):
+    """Print the top flows, the extension and factor type totals and the column list"""
     print(f"\nTop 10 trade flows by total environmental impact:")
     top_impacts = trade_impact.head(10)[['trade_id', 'region1', 'industry1', 'amount', 'total_impact_value', 'factor_count']]
     print(top_impacts.to_string(index=False))
     
-    print(f"\nContext breakdown (sum of all impacts):")
+    # Both breakdowns are sliced from one sum over their columns
     extension_cols = [col for col in trade_impact.columns if col in ['air_emissions', 'water', 'land', 'material', 'energy', 'employment']]
+    factor_type_cols = [col for col in trade_impact.columns if col.endswith('_total')]
+    column_sums = trade_impact[extension_cols + factor_type_cols].sum()
+    
+    print(f"\nContext breakdown (sum of all impacts):")
     if extension_cols:
-        extension_summary = trade_impact[extension_cols].sum().sort_values(ascending=False)
+        extension_summary = column_sums[extension_cols].sort_values(ascending=False)
         for extension, value in extension_summary.head(10).items():
             print(f"  {extension}: {value:,.0f}")
     
     print(f"\nMajor factor type breakdown:")
-    factor_type_cols = [col for col in trade_impact.columns if col.endswith('_total')]
     if factor_type_cols:
-        factor_summary = trade_impact[factor_type_cols].sum().sort_values(ascending=False)
+        factor_summary = column_sums[factor_type_cols].sort_values(ascending=False)
         for factor_type, value in factor_summary.items():
             print(f"  {factor_type}: {value:,.0f}")
     
@@ -156,8 +139,11 @@ def create_trade_impact():
     print(f"\nColumns in trade_impact.csv ({len(trade_impact.columns)} total):")
     for i, col in enumerate(trade_impact.columns):
         print(f"  {i+1:2d}. {col}")
-    
-    return trade_impact
 
 if __name__ == "__main__":
-    create_trade_impact()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Create trade_impact.csv from trade flows and trade factors')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                       help='Print top flows and breakdowns after writing the output')
+    args = parser.parse_args()
+    
+    create_trade_impact(verbose=args.verbose)
\ No newline at end of file
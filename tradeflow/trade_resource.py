@@ -4,14 +4,40 @@ Create split resource files: trade_employment.csv, trade_resource.csv (includes
 Uses configuration-driven approach for imports/exports/domestic analysis
 """
 
+import argparse
 import pandas as pd
 import numpy as np
+import pyarrow.dataset as ds
 from pathlib import Path
 from config_loader import load_config, get_file_path, get_reference_file_path, print_config_summary
+from table_io import read_table, write_table, read_csv_cached, read_reference_csv
+from impact_summary import SUMMARY_TRADE_DTYPES, TRADE_FACTOR_DTYPES, attach_factor_metadata, contains_any, factorize_trades, summarize_impacts, sum_impacts_by_category, sum_impacts_by_keywords, impact_intensity
 
-def create_split_resources():
+# factor.csv columns used for the metadata merge
+FACTOR_COLUMNS = ['factor_id', 'unit', 'stressor', 'extension']
+
+# Context of each extension (factor.csv has no context column)
+EXTENSION_CONTEXTS = {
+    'air_emissions': 'emission/air',
+    'employment': 'economic/employment', 
+    'energy': 'natural_resource/energy',
+    'land': 'natural_resource/land',
+    'material': 'natural_resource/in_ground',
+    'water': 'natural_resource/water'
+}
+
+# Define resource categories for splitting
+EMPLOYMENT_CONTEXTS = ['economic/employment']
+RESOURCES_CONTEXTS = ['emission/water', 'natural_resource/water', 'natural_resource/land', 'natural_resource/energy']
+MATERIALS_CONTEXTS = ['natural_resource/in_ground']
+
+# Additional criteria for resources vs materials
+CROPS_KEYWORDS = ['Crops', 'Primary Crops', 'Agriculture', 'Forestry', 'Fishery']
+
+def create_split_resources(verbose=False):
     """
     Create split resource CSV files based on configuration
+    verbose: print the top flows of each file
     """
     
     # Load configuration
@@ -21,22 +47,37 @@ def create_split_resources():
     print("Reading input files...")
     
     # Read the trade flows using config paths
-    trade_df = pd.read_csv(get_file_path(config, 'industryflow'))
+    trade_df = read_csv_cached(get_file_path(config, 'industryflow'), SUMMARY_TRADE_DTYPES)
     print(f"Loaded {len(trade_df)} trade flows")
     
+    # Read the factors metadata
+    factors_df = read_reference_csv(get_reference_file_path(config, 'factors'), FACTOR_COLUMNS)
+    print(f"Loaded {len(factors_df)} factor definitions")
+    
+    # Factors outside all three categories (mostly air emissions) are never
+    # used; the test runs once per factor, and their trade_factor rows are
+    # dropped while the file is scanned so they are never held in memory
+    factor_contexts = factors_df['extension'].map(EXTENSION_CONTEXTS)
+    used_factors = (
+        factor_contexts.isin(EMPLOYMENT_CONTEXTS + RESOURCES_CONTEXTS + MATERIALS_CONTEXTS) |
+        contains_any(factors_df['stressor'], CROPS_KEYWORDS)
+    )
+    used_factor_filter = ds.field('factor_id').isin(factors_df.loc[used_factors, 'factor_id'].to_numpy())
+    
     # Read the trade factors - use small optimized version by default
     try:
         # Use the small optimized trade_factor.csv (50 selected factors)
         trade_factor_file = get_file_path(config, 'trade_factor')
-        if trade_factor_file.endswith('_lg.csv'):
-            trade_factor_file = trade_factor_file.replace('_lg.csv', '.csv')
+        suffix = Path(trade_factor_file).suffix
+        if trade_factor_file.endswith('_lg' + suffix):
+            trade_factor_file = trade_factor_file.replace('_lg' + suffix, suffix)
         
-        trade_factor_df = pd.read_csv(trade_factor_file)
-        print(f"Loaded {len(trade_factor_df)} trade-factor relationships (optimized small dataset)")
+        trade_factor_df = read_table(trade_factor_file, TRADE_FACTOR_DTYPES, used_factor_filter)
+        print(f"Loaded {len(trade_factor_df)} employment, resource and material trade-factor relationships (optimized small dataset)")
         print(f"File: {trade_factor_file}")
         
         # Check if large file exists and warn about potential issues
-        large_file = trade_factor_file.replace('.csv', '_lg.csv')
+        large_file = trade_factor_file.replace(suffix, '_lg' + suffix)
         if Path(large_file).exists():
             print(f"\n💡 Note: Large file {large_file} exists but using optimized version")
             print(f"   Large file (~1.5GB) causes FATAL ERROR: v8::ToLocalChecked Empty MaybeLocal")
@@ -48,58 +89,43 @@ def create_split_resources():
         print(f"Or run 'python trade.py -lag' for the large version (not recommended)")
         return
     
-    # Read the factors metadata
-    factors_df = pd.read_csv(get_reference_file_path(config, 'factors'))
-    print(f"Loaded {len(factors_df)} factor definitions")
-    
     # Merge trade_factor with factor metadata
     print("Merging trade factors with metadata...")
     # Adapt to actual factor.csv column names: factor_id,unit,stressor,extension
-    enhanced_factors = trade_factor_df.merge(
-        factors_df[['factor_id', 'unit', 'stressor', 'extension']], 
-        on='factor_id', 
-        how='left'
-    )
+    enhanced_factors = attach_factor_metadata(trade_factor_df, factors_df)
     
     # Map stressor names to context (since we don't have context column)
-    enhanced_factors['context'] = enhanced_factors['extension'].map({
-        'air_emissions': 'emission/air',
-        'employment': 'economic/employment', 
-        'energy': 'natural_resource/energy',
-        'land': 'natural_resource/land',
-        'material': 'natural_resource/in_ground',
-        'water': 'natural_resource/water'
-    })
-    
-    # Create name and fullname from stressor
-    enhanced_factors['name'] = enhanced_factors['stressor'].str.split(' - ').str[0]
-    enhanced_factors['fullname'] = enhanced_factors['stressor']
-    
-    # Define resource categories for splitting
-    employment_contexts = ['economic/employment']
-    resources_contexts = ['emission/water', 'natural_resource/water', 'natural_resource/land', 'natural_resource/energy']
-    materials_contexts = ['natural_resource/in_ground']
+    # Mapping the categorical extension would order the contexts by extension;
+    # they are re-categorized in lexical order so the context columns come
+    # out sorted, as when grouping on the context strings
+    enhanced_factors['context'] = pd.Categorical(
+        enhanced_factors['extension'].map(EXTENSION_CONTEXTS),
+        categories=sorted(set(EXTENSION_CONTEXTS.values()))
+    )
     
-    # Additional criteria for resources vs materials
-    crops_keywords = ['Crops', 'Primary Crops', 'Agriculture', 'Forestry', 'Fishery']
+    # fullname is the stressor itself, kept categorical; no per-row name
+    # column is built since nothing downstream reads it
+    enhanced_factors['fullname'] = enhanced_factors['stressor']
     
     print("Splitting factors into categories...")
     
+    is_crop = contains_any(enhanced_factors['fullname'], CROPS_KEYWORDS)
+    
     # 1. EMPLOYMENT FACTORS
     employment_factors = enhanced_factors[
-        enhanced_factors['context'].isin(employment_contexts)
+        enhanced_factors['context'].isin(EMPLOYMENT_CONTEXTS)
     ].copy()
     
     # 2. RESOURCES FACTORS (water, land, energy + crops/agriculture)
     resources_factors = enhanced_factors[
-        (enhanced_factors['context'].isin(resources_contexts)) |
-        (enhanced_factors['fullname'].str.contains('|'.join(crops_keywords), case=False, na=False))
+        (enhanced_factors['context'].isin(RESOURCES_CONTEXTS)) |
+        is_crop
     ].copy()
     
     # 3. MATERIALS FACTORS (remaining in_ground materials, excluding crops)
     materials_factors = enhanced_factors[
-        (enhanced_factors['context'].isin(materials_contexts)) &
-        (~enhanced_factors['fullname'].str.contains('|'.join(crops_keywords), case=False, na=False))
+        (enhanced_factors['context'].isin(MATERIALS_CONTEXTS)) &
+        ~is_crop
     ].copy()
     
     print(f"Factor split summary:")
@@ -127,18 +153,14 @@ def create_split_resources():
         
         print(f"Processing {category} factors...")
         
-        # Calculate summary statistics
-        summary = factors_data.groupby('trade_id').agg({
-            'impact_value': ['sum', 'count'],
-            'factor_id': 'nunique'
-        }).round(3)
+        # Factorize trade_id once; every summary below accumulates into its codes
+        trades = factorize_trades(factors_data)
         
-        # Flatten column names
-        summary.columns = [f'total_{category}_value', f'{category}_count', f'unique_{category}_factors']
-        summary = summary.reset_index()
+        # Calculate summary statistics
+        summary = summarize_impacts(factors_data, [f'total_{category}_value', f'{category}_count', f'unique_{category}_factors'], trades)
         
         # Calculate impact by context within this category
-        context_impacts = factors_data.groupby(['trade_id', 'context'])['impact_value'].sum().unstack(fill_value=0)
+        context_impacts = sum_impacts_by_category(factors_data, 'context', trades)
         context_impacts = context_impacts.round(3)
         
         # Calculate specific subcategories
@@ -165,47 +187,22 @@ def create_split_resources():
                 'Other_Materials': ['Extraction']
             }
         
-        subcategory_impacts = pd.DataFrame(index=factors_data['trade_id'].unique())
-        
-        for subcat_name, keywords in subcategories.items():
-            matching_factors = factors_data[
-                factors_data['fullname'].str.contains('|'.join(keywords), case=False, na=False)
-            ]
-            
-            if not matching_factors.empty:
-                subcat_impact = matching_factors.groupby('trade_id')['impact_value'].sum()
-                subcategory_impacts[f'{category}_{subcat_name}'] = subcat_impact
-        
-        subcategory_impacts = subcategory_impacts.fillna(0).round(3)
+        subcategory_impacts = sum_impacts_by_keywords(factors_data, subcategories, f'{category}_', trades)
         
         # Merge all data with original trade information
-        result_df = trade_df.merge(summary, on='trade_id', how='left')
-        
-        # Add context-based impacts
-        if not context_impacts.empty:
-            result_df = result_df.merge(
-                context_impacts.reset_index(), 
-                on='trade_id', 
-                how='left'
-            )
-        
-        # Add subcategory impacts
-        if not subcategory_impacts.empty:
-            subcategory_reset = subcategory_impacts.reset_index()
-            subcategory_reset = subcategory_reset.rename(columns={'index': 'trade_id'})
-            result_df = result_df.merge(
-                subcategory_reset, 
-                on='trade_id', 
-                how='left'
-            )
+        # The summary, context and subcategory frames share their trade_id
+        # index, so they are put side by side and joined in a single pass
+        result_df = trade_df.join(
+            pd.concat([summary, context_impacts, subcategory_impacts], axis=1),
+            on='trade_id'
+        )
         
         # Fill NaN values with 0
         impact_columns = [col for col in result_df.columns if col not in ['trade_id', 'year', 'region1', 'region2', 'industry1', 'industry2', 'amount']]
         result_df[impact_columns] = result_df[impact_columns].fillna(0)
         
         # Calculate intensity
-        result_df[f'{category}_intensity'] = (result_df[f'total_{category}_value'] / result_df['amount']).round(6)
-        result_df[f'{category}_intensity'] = result_df[f'{category}_intensity'].replace([np.inf, -np.inf], 0)
+        result_df[f'{category}_intensity'] = impact_intensity(result_df[f'total_{category}_value'], result_df['amount'])
         
         # Sort by total value descending
         result_df = result_df.sort_values(f'total_{category}_value', ascending=False)
@@ -222,7 +219,7 @@ def create_split_resources():
     for category, df in output_files.items():
         file_key = file_mapping[category]
         output_path = get_file_path(config, file_key)
-        df.to_csv(output_path, index=False)
+        write_table(df, output_path)
         
         # Display summary
         total_impact = df[f'total_{category}_value'].sum()
@@ -233,13 +230,18 @@ def create_split_resources():
         print(f"  Flows with {category} data: {flows_with_data}")
         print(f"  Columns: {len(df.columns)}")
         
-        if flows_with_data > 0:
+        if verbose and flows_with_data > 0:
             print(f"  Top {category} flows:")
             top_flows = df[df[f'{category}_count'] > 0].head(3)
-            for _, row in top_flows.iterrows():
-                print(f"    {row['region1']} {row['industry1']} -> {row['region2']}: {row[f'total_{category}_value']:,.0f}")
+            for region1, industry1, region2, value in top_flows[['region1', 'industry1', 'region2', f'total_{category}_value']].itertuples(index=False, name=None):
+                print(f"    {region1} {industry1} -> {region2}: {value:,.0f}")
     
     return output_files
 
 if __name__ == "__main__":
-    create_split_resources()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Create the employment, resource and material split files')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                       help='Print top flows and breakdowns after writing the output')
+    args = parser.parse_args()
+    
+    create_split_resources(verbose=args.verbose)
\ No newline at end of file
@@ -214,15 +214,23 @@ class FEDEFLIntegrator:
         
         mapped_factors = []
         
-        for _, factor in factors_df.iterrows():
-            factor_name = factor.get('factor_name', factor.iloc[0] if len(factor) > 0 else '')
-            
+        # Resolve the name and id columns once, then walk plain values instead
+        # of building a Series per row
+        if 'factor_name' in factors_df:
+            factor_names = factors_df['factor_name']
+        elif len(factors_df.columns) > 0:
+            factor_names = factors_df.iloc[:, 0]
+        else:
+            factor_names = pd.Series('', index=factors_df.index)
+        factor_ids = factors_df['factor_id'] if 'factor_id' in factors_df else factors_df.index.to_series()
+        
+        for factor_id, factor_name in zip(factor_ids, factor_names):
             # Try to find matching flow
             matching_flow = self._find_matching_flow(factor_name)
             
             if matching_flow is not None:
                 mapped_factors.append({
-                    'factor_id': factor.get('factor_id', factor.name),
+                    'factor_id': factor_id,
                     'factor_name': factor_name,
                     'flow_uuid': matching_flow['flow_uuid'],
                     'flowable': matching_flow['flowable'],
@@ -234,7 +242,7 @@ class FEDEFLIntegrator:
                 # Create new flow for unmapped factors
                 new_flow = self._create_flow_for_factor(factor_name)
                 mapped_factors.append({
-                    'factor_id': factor.get('factor_id', factor.name),
+                    'factor_id': factor_id,
                     'factor_name': factor_name,
                     'flow_uuid': new_flow['flow_uuid'],
                     'flowable': new_flow['flowable'],
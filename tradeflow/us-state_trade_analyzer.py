@@ -27,6 +27,9 @@ class StateTradeAnalyzer:
         self.output_multiplier = 2.1
         self.tax_revenue_rate = 0.12
         
+        # Generator for the placeholder metrics, seeded for reproducible results
+        self.rng = np.random.default_rng(42)
+        
     def _load_state_codes(self):
         """Load US state codes and names"""
         # Standard US state codes
@@ -102,14 +105,44 @@ class StateTradeAnalyzer:
         """
         print("    🗺️ Disaggregating domestic flows to state level...")
         
-        state_flows = []
-        
-        for _, trade_row in base_trade_df.iterrows():
-            # Get state disaggregation for this trade flow
-            state_disagg = self._disaggregate_single_flow(trade_row, bea_state_data)
-            state_flows.extend(state_disagg)
-        
-        state_df = pd.DataFrame(state_flows)
+        n_trades = len(base_trade_df)
+        trade_ids = base_trade_df['trade_id'].to_numpy() if 'trade_id' in base_trade_df else np.full(n_trades, '')
+        amounts = base_trade_df['amount'].to_numpy(dtype=float) if 'amount' in base_trade_df else np.zeros(n_trades)
+        industry_codes = base_trade_df['industry1'].fillna('') if 'industry1' in base_trade_df else pd.Series([''] * n_trades)
+        
+        # Get industry category for specialization lookup: categorize each
+        # distinct code once, then gather category codes per trade
+        industry_idx, distinct_codes = pd.factorize(industry_codes)
+        distinct_category_codes, categories = pd.factorize(pd.Index(distinct_codes).map(self._categorize_industry))
+        category_codes = distinct_category_codes[industry_idx]
+        
+        # Origin/destination state pairs and flow shares, once per category
+        pair_tables = [self._state_pair_shares(industry, bea_state_data) for industry in categories]
+        pair_counts = np.array([len(table) for table in pair_tables], dtype=np.int64)
+        pair_starts = np.cumsum(pair_counts) - pair_counts
+        
+        # Expand every trade into its category's state pairs, in trade order:
+        # each output row's offset inside its trade's block, shifted to the
+        # first pair of that trade's category
+        counts = pair_counts[category_codes]
+        block_starts = np.cumsum(counts) - counts
+        trade_pos = np.repeat(np.arange(n_trades), counts)
+        pair_idx = np.arange(counts.sum()) - np.repeat(block_starts - pair_starts[category_codes], counts)
+        
+        if pair_tables:
+            all_pairs = pd.concat(pair_tables, ignore_index=True)
+        else:
+            all_pairs = pd.DataFrame({'origin_state': [], 'destination_state': [], 'flow_share': []})
+        
+        state_df = pd.DataFrame({
+            'trade_id': trade_ids[trade_pos],
+            'origin_state': all_pairs['origin_state'].to_numpy()[pair_idx],
+            'destination_state': all_pairs['destination_state'].to_numpy()[pair_idx],
+            'state_industry_code': np.asarray(categories, dtype=object)[category_codes][trade_pos],
+            'flow_value': amounts[trade_pos] * all_pairs['flow_share'].to_numpy()[pair_idx],
+            'flow_type': 'inter_state',
+            'employment_impact': 0.0  # Will be calculated later
+        })
         
         # Calculate employment impacts
         if not state_df.empty:
@@ -118,44 +151,22 @@ class StateTradeAnalyzer:
         print(f"      ✅ Created {len(state_df)} state-to-state flow records")
         return state_df
     
-    def _disaggregate_single_flow(self, trade_row, bea_data=None):
-        """Disaggregate a single trade flow to state level"""
-        flows = []
-        
-        # Get industry category for specialization lookup
-        industry = self._categorize_industry(trade_row.get('industry1', ''))
-        
+    def _state_pair_shares(self, industry, bea_data=None):
+        """Inter-state (origin, destination) pairs and flow shares for an industry category"""
         # Get relevant states for this industry
         producing_states = self._get_producing_states(industry)
         consuming_states = self._get_consuming_states(industry)
         
-        # Total flow value to distribute
-        total_value = float(trade_row.get('amount', 0))
-        
-        # Distribute flow across state pairs
-        for origin_state in producing_states:
-            for dest_state in consuming_states:
-                if origin_state != dest_state:  # Inter-state only
-                    
-                    # Calculate flow share based on production/consumption patterns
-                    flow_share = self._calculate_state_flow_share(
-                        origin_state, dest_state, industry, bea_data
-                    )
-                    
-                    if flow_share > 0:
-                        flow_value = total_value * flow_share
-                        
-                        flows.append({
-                            'trade_id': trade_row.get('trade_id', ''),
-                            'origin_state': origin_state,
-                            'destination_state': dest_state,
-                            'state_industry_code': industry,
-                            'flow_value': flow_value,
-                            'flow_type': 'inter_state',
-                            'employment_impact': 0  # Will be calculated later
-                        })
-        
-        return flows
+        pairs = [
+            (origin_state, dest_state,
+             self._calculate_state_flow_share(origin_state, dest_state, industry, bea_data))
+            for origin_state in producing_states
+            for dest_state in consuming_states
+            if origin_state != dest_state  # Inter-state only
+        ]
+        pairs = pd.DataFrame(pairs, columns=['origin_state', 'destination_state', 'flow_share'])
+        
+        return pairs[pairs['flow_share'] > 0]
     
     def _categorize_industry(self, industry_code):
         """Categorize industry code into broad category"""
@@ -228,29 +239,17 @@ class StateTradeAnalyzer:
         
         print("    👥 Calculating employment impacts...")
         
-        for index, row in state_flows_df.iterrows():
-            industry = row['state_industry_code']
-            flow_value = row['flow_value']
-            
-            # Get employment multipliers for industry
-            multipliers = self.employment_multipliers.get(industry, 
-                                                        self.employment_multipliers['default'])
-            
-            # Calculate employment impact (jobs per million dollars)
-            jobs_per_million = 15.0  # Base jobs per million dollars (varies by industry)
-            
-            if industry == 'manufacturing':
-                jobs_per_million = 12.0
-            elif industry == 'agriculture':
-                jobs_per_million = 20.0
-            elif industry == 'services':
-                jobs_per_million = 18.0
-            elif industry == 'construction':
-                jobs_per_million = 25.0
-            
-            # Calculate total employment impact
-            employment_impact = (flow_value / 1000000) * jobs_per_million
-            state_flows_df.loc[index, 'employment_impact'] = employment_impact
+        # Employment impact rates (jobs per million dollars) by industry
+        jobs_per_million = {
+            'manufacturing': 12.0,
+            'agriculture': 20.0,
+            'services': 18.0,
+            'construction': 25.0
+        }
+        rates = state_flows_df['state_industry_code'].map(jobs_per_million).fillna(15.0)  # Base jobs per million dollars
+        
+        # Calculate total employment impact
+        state_flows_df['employment_impact'] = (state_flows_df['flow_value'] / 1000000) * rates
         
         return state_flows_df
     
@@ -267,35 +266,27 @@ class StateTradeAnalyzer:
             'employment_impact': 'sum'
         }).reset_index()
         
-        impacts = []
-        
-        for _, row in state_industry_agg.iterrows():
-            state = row['destination_state']
-            industry = row['state_industry_code']
-            flow_value = row['flow_value']
-            direct_jobs = row['employment_impact']
-            
-            # Get multipliers
-            multipliers = self.employment_multipliers.get(industry,
-                                                        self.employment_multipliers['default'])
-            
-            # Calculate indirect and induced employment
-            indirect_jobs = direct_jobs * multipliers['indirect']
-            induced_jobs = direct_jobs * multipliers['induced']
-            
-            # Calculate output and tax impacts
-            total_output_impact = flow_value * self.output_multiplier
-            tax_revenue_impact = total_output_impact * self.tax_revenue_rate
-            
-            impacts.append({
-                'state_code': state,
-                'industry_code': industry,
-                'direct_jobs': direct_jobs,
-                'indirect_jobs': indirect_jobs, 
-                'induced_jobs': induced_jobs,
-                'total_output_impact': total_output_impact,
-                'tax_revenue_impact': tax_revenue_impact
-            })
+        industry = state_industry_agg['state_industry_code']
+        direct_jobs = state_industry_agg['employment_impact']
+        
+        # Get multipliers per industry, filling unknown industries with the default
+        default = self.employment_multipliers['default']
+        indirect_rates = industry.map({k: v['indirect'] for k, v in self.employment_multipliers.items()}).fillna(default['indirect'])
+        induced_rates = industry.map({k: v['induced'] for k, v in self.employment_multipliers.items()}).fillna(default['induced'])
+        
+        # Calculate output and tax impacts
+        total_output_impact = state_industry_agg['flow_value'] * self.output_multiplier
+        
+        # Build the result column by column rather than from a list of row dicts
+        impacts = {
+            'state_code': state_industry_agg['destination_state'],
+            'industry_code': industry,
+            'direct_jobs': direct_jobs,
+            'indirect_jobs': direct_jobs * indirect_rates,
+            'induced_jobs': direct_jobs * induced_rates,
+            'total_output_impact': total_output_impact,
+            'tax_revenue_impact': total_output_impact * self.tax_revenue_rate
+        }
         
         impacts_df = pd.DataFrame(impacts)
         print(f"      ✅ Calculated impacts for {len(impacts_df)} state-industry combinations")
@@ -309,7 +300,9 @@ class StateTradeAnalyzer:
         if export_flows_df.empty:
             return pd.DataFrame()
         
-        competitiveness_data = []
+        # Per-group metrics, expanded to one row per trade after the loop
+        trade_ids, group_sizes = [], []
+        rcas, sophistications, market_shares = [], [], []
         
         # Group by industry for analysis
         industry_groups = export_flows_df.groupby(['industry1', 'region2'])
@@ -327,19 +320,23 @@ class StateTradeAnalyzer:
             # Market share (simplified)
             market_share = self._calculate_market_share(industry, destination, total_exports)
             
-            # Growth rate (would need historical data - using placeholder)
-            growth_rate = np.random.normal(0.02, 0.05)  # Placeholder
-            
-            for _, row in group.iterrows():
-                competitiveness_data.append({
-                    'trade_id': row.get('trade_id', ''),
-                    'revealed_comparative_advantage': rca,
-                    'export_sophistication_index': sophistication,
-                    'market_share': market_share,
-                    'growth_rate': growth_rate
-                })
-        
-        competitiveness_df = pd.DataFrame(competitiveness_data)
+            trade_ids.append(group['trade_id'].to_numpy() if 'trade_id' in group else np.full(len(group), ''))
+            group_sizes.append(len(group))
+            rcas.append(rca)
+            sophistications.append(sophistication)
+            market_shares.append(market_share)
+        
+        # Growth rate (would need historical data - using placeholder), drawn
+        # for all groups at once
+        growth_rates = self.rng.normal(0.02, 0.05, len(group_sizes))  # Placeholder
+        
+        competitiveness_df = pd.DataFrame({
+            'trade_id': np.concatenate(trade_ids) if trade_ids else [],
+            'revealed_comparative_advantage': np.repeat(rcas, group_sizes),
+            'export_sophistication_index': np.repeat(sophistications, group_sizes),
+            'market_share': np.repeat(market_shares, group_sizes),
+            'growth_rate': np.repeat(growth_rates, group_sizes)
+        })
         print(f"      ✅ Analyzed competitiveness for {len(competitiveness_df)} export flows")
         
         return competitiveness_df
@@ -351,7 +348,9 @@ class StateTradeAnalyzer:
         if import_flows_df.empty:
             return pd.DataFrame()
         
-        dependency_data = []
+        # Per-group metrics, expanded to one row per trade after the loop
+        trade_ids, group_sizes = [], []
+        penetration_ratios, vulnerabilities, alternative_counts, strategic_levels = [], [], [], []
         
         # Group by industry and origin
         industry_groups = import_flows_df.groupby(['industry2', 'region1'])
@@ -365,16 +364,20 @@ class StateTradeAnalyzer:
             alternative_suppliers = self._count_alternative_suppliers(industry, origin, import_flows_df)
             strategic_importance = self._assess_strategic_importance(industry)
             
-            for _, row in group.iterrows():
-                dependency_data.append({
-                    'trade_id': row.get('trade_id', ''),
-                    'import_penetration_ratio': penetration_ratio,
-                    'supply_chain_vulnerability': vulnerability,
-                    'alternative_suppliers': alternative_suppliers,
-                    'strategic_importance': strategic_importance
-                })
-        
-        dependency_df = pd.DataFrame(dependency_data)
+            trade_ids.append(group['trade_id'].to_numpy() if 'trade_id' in group else np.full(len(group), ''))
+            group_sizes.append(len(group))
+            penetration_ratios.append(penetration_ratio)
+            vulnerabilities.append(vulnerability)
+            alternative_counts.append(alternative_suppliers)
+            strategic_levels.append(strategic_importance)
+        
+        dependency_df = pd.DataFrame({
+            'trade_id': np.concatenate(trade_ids) if trade_ids else [],
+            'import_penetration_ratio': np.repeat(penetration_ratios, group_sizes),
+            'supply_chain_vulnerability': np.repeat(vulnerabilities, group_sizes),
+            'alternative_suppliers': np.repeat(alternative_counts, group_sizes),
+            'strategic_importance': np.repeat(strategic_levels, group_sizes)
+        })
         print(f"      ✅ Analyzed dependencies for {len(dependency_df)} import flows")
         
         return dependency_df
@@ -383,7 +386,7 @@ class StateTradeAnalyzer:
         """Calculate Revealed Comparative Advantage"""
         # Simplified RCA calculation
         # In practice: (Xij/Xit) / (Xwj/Xwt)
-        base_rca = np.random.uniform(0.5, 2.0)  # Placeholder
+        base_rca = self.rng.uniform(0.5, 2.0)  # Placeholder
         return base_rca
     
     def _calculate_sophistication(self, industry):
@@ -408,7 +411,7 @@ class StateTradeAnalyzer:
         """Calculate import penetration ratio"""
         # Simplified: imports / (domestic production + imports)
         # Using placeholder domestic production values
-        domestic_production = imports * np.random.uniform(2, 10)
+        domestic_production = imports * self.rng.uniform(2, 10)
         return imports / (domestic_production + imports)
     
     def _assess_supply_chain_vulnerability(self, origin, industry):